@@ -1,105 +1,152 @@
 import os
 import asyncio
+import functools
+import heapq
 import uuid
 import json
 import logging
-from itertools import combinations, cycle
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base, relationship
+from sqlalchemy.orm import sessionmaker
 from sqlalchemy import (
-    Column, Integer, BigInteger, String, TIMESTAMP, JSON, ForeignKey,
-    func, select, and_, update as sa_update
+    func, select, and_, case, exists, text, insert, delete, tuple_,
+    update as sa_update
 )
-from passlib.hash import bcrypt
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError, ProgrammingError
+from passlib.context import CryptContext
 
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, InputFile
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, InputFile, Update
+from telegram.error import RetryAfter
 from telegram.ext import (
-    ApplicationBuilder, CommandHandler, CallbackQueryHandler,
-    ConversationHandler, MessageHandler, filters
+    Application, ApplicationBuilder, CommandHandler, CallbackQueryHandler,
+    ConversationHandler, MessageHandler, filters,
+    BasePersistence, PersistenceInput, BaseRateLimiter
 )
 
+from bracket import compile_bracket, bracket_ready, bracket_places, bracket_sides
+from models import Administrator, RegCode, Tournament, Player, Round, Match, BotState
+from queries import (
+    Q_ADMIN_BY_TG, Q_ADMIN_BY_LOGIN, Q_LOGGED_IN_ADMINS,
+    Q_ENDED_TOURNAMENTS, Q_ACTIVE_TOURNAMENTS,
+    Q_TOURNAMENT_WITH_PLAYERS, Q_ROUNDS_WITH_MATCHES, Q_HISTORY,
+    Q_PLAYERS_BY_SCORE, Q_LAST_SIMPLE_DONE,
+    Q_MATCH_TOURNAMENT, Q_LOCK_MATCH_ROUND
+)
+from seeding import seating
+
 logging.basicConfig(format="%(asctime)s %(levelname)s: %(message)s", level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")  # fake_telegram.py подменяет
+BOT_MODE = os.getenv("BOT_MODE", "polling")  # polling | webhook
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # публичный https-адрес без пути
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+TOURNAMENT_CACHE_SIZE = int(os.getenv("TOURNAMENT_CACHE_SIZE", "64"))
 DB_URL = (
     f"postgresql+asyncpg://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
     f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 )
-
-engine = create_async_engine(DB_URL, future=True, echo=False)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+DB_POOL_LOG_INTERVAL = int(os.getenv("DB_POOL_LOG_INTERVAL", "300"))
+DB_QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "500"))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "2"))
+LOGIN_CACHE_TTL = int(os.getenv("LOGIN_CACHE_TTL", "3600"))
+LOGIN_CACHE_SIZE = int(os.getenv("LOGIN_CACHE_SIZE", "1024"))
+PERSISTENCE_INTERVAL = float(os.getenv("PERSISTENCE_INTERVAL", "5"))
+PERSISTENCE_FLUSH_DELAY = float(os.getenv("PERSISTENCE_FLUSH_DELAY", "1"))
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "64"))
+CALLBACK_DEDUP_TTL = float(os.getenv("CALLBACK_DEDUP_TTL", "10"))
+CALLBACK_DEDUP_SIZE = int(os.getenv("CALLBACK_DEDUP_SIZE", "4096"))
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))  # сообщений в секунду на бота
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))  # в секунду на личный чат
+SEND_GROUP_PER_MIN = float(os.getenv("SEND_GROUP_PER_MIN", "20"))  # в минуту на группу
+SEND_CHAT_BURST = int(os.getenv("SEND_CHAT_BURST", "3"))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
+KEYBOARD_CACHE_SIZE = int(os.getenv("KEYBOARD_CACHE_SIZE", "1024"))
+
+engine = create_async_engine(
+    DB_URL, future=True, echo=False,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+    query_cache_size=DB_QUERY_CACHE_SIZE,
+    connect_args={"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE},
+)
 AsyncSessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
-Base = declarative_base()
+
+
+class PoolStats:
+    """Время ожидания соединения из пула и текущее состояние пула."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait):
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+    def snapshot(self, reset=False) -> dict:
+        pool = engine.sync_engine.pool
+        snap = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "checkouts": self.checkouts,
+            "wait_avg_ms": self.wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+            "wait_max_ms": self.wait_max * 1000,
+        }
+        if reset:
+            self.checkouts, self.wait_total, self.wait_max = 0, 0.0, 0.0
+        return snap
+
+
+pool_stats = PoolStats()
 
 
 async def get_session():
     async with AsyncSessionLocal() as session:
+        # берём соединение сразу, чтобы замерить ожидание пула
+        started = time.perf_counter()
+        await session.connection()
+        pool_stats.record(time.perf_counter() - started)
         yield session
 
 
-class Administrator(Base):
-    __tablename__ = "administrators"
-    id = Column(Integer, primary_key=True)
-    telegram_id = Column(BigInteger, unique=True)
-    username = Column(String(64), nullable=False, unique=True)
-    password = Column(String(128), nullable=False)
-    role = Column(String(16), nullable=False, default="admin")
-    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
-
-
-class RegCode(Base):
-    __tablename__ = "reg_codes"
-    code = Column(String(64), primary_key=True)
-    role = Column(String(16), nullable=False)
-    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
-
-
-class Tournament(Base):
-    __tablename__ = "tournaments"
-    id = Column(Integer, primary_key=True)
-    admin_id = Column(Integer, ForeignKey("administrators.id"), nullable=False)
-    name = Column(String(255), nullable=False)
-    tournament_type = Column(String(32), nullable=False)
-    status = Column(String(32), nullable=False, default="registration")
-    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
-    finished_at = Column(TIMESTAMP(timezone=True))
-    data = Column(JSON, default={})
-    players = relationship("Player", back_populates="tournament")
-    rounds = relationship("Round", back_populates="tournament")
-
-
-class Player(Base):
-    __tablename__ = "players"
-    id = Column(Integer, primary_key=True)
-    tournament_id = Column(Integer, ForeignKey("tournaments.id"), nullable=False)
-    name = Column(String(128), nullable=False)
-    score = Column(Integer, default=0)
-    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
-    tournament = relationship("Tournament", back_populates="players")
-
-
-class Round(Base):
-    __tablename__ = "rounds"
-    id = Column(Integer, primary_key=True)
-    tournament_id = Column(Integer, ForeignKey("tournaments.id"), nullable=False)
-    round_type = Column(String(16), nullable=False)
-    data = Column(JSON, nullable=False)
-    status = Column(String(16), nullable=False, default="pending")
-    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
-    tournament = relationship("Tournament", back_populates="rounds")
-
-
-class Match(Base):
-    __tablename__ = "matches"
-    id = Column(Integer, primary_key=True)
-    round_id = Column(Integer, ForeignKey("rounds.id"), nullable=False)
-    table_number = Column(Integer)
-    player1_id = Column(Integer, ForeignKey("players.id"))
-    player2_id = Column(Integer, ForeignKey("players.id"))
-    result = Column(JSON, default={})
-    status = Column(String(16), default="scheduled")
-    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+def format_pool_stats(snap) -> str:
+    return (
+        f"pool {snap['checked_out']}/{snap['size']} checked out, {snap['idle']} idle, "
+        f"{snap['overflow']} overflow; wait avg {snap['wait_avg_ms']:.1f} ms, "
+        f"max {snap['wait_max_ms']:.1f} ms over {snap['checkouts']} checkouts"
+    )
+
+
+async def log_pool_stats():
+    """Периодически пишет состояние пула в лог (счётчики ожидания сбрасываются)."""
+    while True:
+        await asyncio.sleep(DB_POOL_LOG_INTERVAL)
+        logger.info("📊 DB " + format_pool_stats(pool_stats.snapshot(reset=True)))
 
 
 (
@@ -110,13 +157,241 @@ class Match(Base):
 ) = range(11)
 
 
+# ---------- KEYBOARDS ----------
+# Статичные клавиатуры собираются один раз при импорте, параметризованные
+# кэшируются в ограниченном LRU. Объекты telegram неизменяемы, так что
+# один и тот же экземпляр можно отдавать во все сообщения.
+@functools.lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
 def back_btn(cb="home"):
     return InlineKeyboardButton("⬅️ Назад", callback_data=cb)
 
 
+@functools.lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def back_markup(cb="home"):
+    return InlineKeyboardMarkup([[back_btn(cb)]])
+
+
+HOME_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("➕ Новый турнир", callback_data="ct_start")],
+    [InlineKeyboardButton("📜 История", callback_data="hist")],
+    [InlineKeyboardButton("🎾 Активные", callback_data="act")],
+    [InlineKeyboardButton("⚙️ Настройки", callback_data="settings")],
+])
+
+_SETTINGS_ROWS = [
+    [InlineKeyboardButton("✏️ Сменить логин", callback_data="change_login")],
+    [InlineKeyboardButton("🔒 Сменить пароль", callback_data="change_pass")],
+    [back_btn("home"), InlineKeyboardButton("🚪 Выйти", callback_data="logout")],
+]
+SETTINGS_MARKUP = InlineKeyboardMarkup(_SETTINGS_ROWS)
+SETTINGS_MAIN_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("➕ Рег. код", callback_data="gen_code")],
+    [InlineKeyboardButton("👥 Список админов", callback_data="list_admins")],
+    *_SETTINGS_ROWS,
+])
+
+CONFIRM_LOGIN_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("✅ Подтвердить", callback_data="confirm_login")], [back_btn("settings")]
+])
+CONFIRM_PASS_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("✅ Подтвердить", callback_data="confirm_pass")], [back_btn("settings")]
+])
+
+
+# ---------- LOGIN CACHE ----------
+class LoginCache:
+    """
+    TTL-кэш telegram_id -> (admin_id, role).
+    None – известно, что пользователь не залогинен (тоже кэшируется).
+    """
+    MISS = object()
+
+    def __init__(self, ttl=3600, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._items: OrderedDict[int, tuple[float, tuple[int, str] | None]] = OrderedDict()
+
+    def get(self, uid):
+        item = self._items.get(uid)
+        if item is None or item[0] < time.monotonic():
+            self._items.pop(uid, None)
+            return self.MISS
+        self._items.move_to_end(uid)
+        return item[1]
+
+    def put(self, uid, value):
+        self._items[uid] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(uid)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def invalidate(self, uid=None, admin_id=None):
+        if uid is not None:
+            self._items.pop(uid, None)
+        if admin_id is not None:
+            for key in [k for k, (_, v) in self._items.items() if v and v[0] == admin_id]:
+                del self._items[key]
+
+
+login_cache = LoginCache(LOGIN_CACHE_TTL, LOGIN_CACHE_SIZE)
+
+
+async def lookup_admin(uid) -> tuple[int, str] | None:
+    """(admin_id, role) администратора, залогиненного с этого telegram_id."""
+    cached = login_cache.get(uid)
+    if cached is not LoginCache.MISS:
+        return cached
+    async for s in get_session():
+        admin = (await s.execute(Q_ADMIN_BY_TG, {"uid": uid})).scalar_one_or_none()
+    value = (admin.id, admin.role) if admin else None
+    login_cache.put(uid, value)
+    return value
+
+
+async def warm_login_cache():
+    """Одним запросом заполняет кэш всеми залогиненными админами (после рестарта)."""
+    async for s in get_session():
+        rows = (await s.execute(Q_LOGGED_IN_ADMINS)).all()
+    for uid, admin_id, role in rows:
+        login_cache.put(uid, (admin_id, role))
+    logger.info(f"🔑 Login cache warmed with {len(rows)} admins")
+
+
+# ---------- SERIALIZATION ----------
+class KeyedLocks:
+    """asyncio.Lock на ключ; замок удаляется, когда его больше никто не ждёт."""
+
+    def __init__(self):
+        self._locks: dict[object, list] = {}  # key -> [lock, waiters]
+
+    @asynccontextmanager
+    async def hold(self, key):
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+
+user_locks = KeyedLocks()
+tournament_locks = KeyedLocks()
+
+
+class SerializedApplication(Application):
+    """
+    Апдейты обрабатываются конкурентно (concurrent_updates), но апдейты
+    одного пользователя – строго по очереди, целиком, со всеми группами
+    обработчиков. ConversationHandler читает состояние диалога ещё до
+    вызова обработчика, поэтому замок берётся здесь, а не в обработчиках.
+    """
+
+    async def process_update(self, update):
+        user = update.effective_user if isinstance(update, Update) else None
+        if user is None:
+            return await super().process_update(update)
+        async with user_locks.hold(user.id):
+            return await super().process_update(update)
+
+
+def serialized(tournament_of=None):
+    """
+    Все записи в один турнир идут по очереди. Замок пользователя к этому
+    моменту уже взят (SerializedApplication), порядок захвата всегда:
+    пользователь, турнир. tournament_of(update, ctx) – корутина,
+    возвращающая турнир апдейта; по умолчанию – турнир, открытый пользователем.
+    """
+    def wrap(func):
+        @functools.wraps(func)
+        async def handler(update, ctx):
+            tid = await tournament_of(update, ctx) if tournament_of else ctx.user_data.get("tid")
+            async with tournament_locks.hold(tid):
+                return await func(update, ctx)
+        return handler
+    return wrap
+
+
+# ---------- IDEMPOTENCY ----------
+class CallbackDedup:
+    """
+    Память о недавно нажатых кнопках: (user, message_id, callback data) ->
+    (истекает, выполнено). Повторное нажатие той же кнопки того же
+    сообщения в течение ttl секунд повторно не обрабатывается.
+    """
+
+    def __init__(self, ttl=10, maxsize=4096):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._items: OrderedDict[tuple, list] = OrderedDict()
+        self.duplicates = 0
+
+    def check(self, key):
+        """None для нового нажатия (и запоминает его), иначе флаг «выполнено»."""
+        now = time.monotonic()
+        item = self._items.get(key)
+        if item is not None and item[0] > now:
+            self.duplicates += 1
+            return item[1]
+        self._items[key] = [now + self.ttl, False]
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+        return None
+
+    def done(self, key):
+        item = self._items.get(key)
+        if item is not None:
+            item[1] = True
+
+    def forget(self, key):
+        self._items.pop(key, None)
+
+
+callback_dedup = CallbackDedup(CALLBACK_DEDUP_TTL, CALLBACK_DEDUP_SIZE)
+
+# обработчик отклонил нажатие и ничего не изменил – его можно повторить
+NOT_APPLIED = object()
+
+
+def idempotent(func):
+    """
+    Двойные нажатия отвечаются из памяти, не дожидаясь замка турнира и БД.
+    Если обработчик упал или вернул NOT_APPLIED, нажатие забывается,
+    чтобы его можно было повторить.
+    """
+    @functools.wraps(func)
+    async def handler(update, ctx):
+        q = update.callback_query
+        msg_id = q.message.message_id if q.message else q.inline_message_id
+        key = (update.effective_user.id, msg_id, q.data)
+        state = callback_dedup.check(key)
+        if state is not None:
+            await q.answer("✅ Уже выполнено" if state else "⏳ Уже выполняется…")
+            return
+        try:
+            result = await func(update, ctx)
+        except Exception:
+            callback_dedup.forget(key)
+            raise
+        if result is NOT_APPLIED:
+            callback_dedup.forget(key)
+            return None
+        callback_dedup.done(key)
+        return result
+    return handler
+
+
 async def require_login(update, ctx) -> bool:
     if "admin_id" in ctx.user_data:
         return False
+    # user_data теряется при рестарте – восстанавливаем вход по telegram_id
+    admin = await lookup_admin(update.effective_user.id)
+    if admin:
+        ctx.user_data.update({"admin_id": admin[0], "role": admin[1]})
+        return False
     msg = "❌ Пожалуйста, авторизуйтесь (/start)."
     if update.callback_query:
         await update.callback_query.answer(msg, show_alert=True)
@@ -125,26 +400,106 @@ async def require_login(update, ctx) -> bool:
     return True
 
 
+# ---------- MIGRATIONS ----------
+def load_migrations() -> list[tuple[int, str, list[str]]]:
+    """
+    Читает migrations/NNNN_name.sql по порядку номеров.
+    Файл делится на операторы по «;» – в миграциях не должно быть тел функций.
+    """
+    migrations = []
+    for fname in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not fname.endswith(".sql"):
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, fname), encoding="utf8") as f:
+            sql = "\n".join(line.split("--", 1)[0] for line in f)
+        statements = [st.strip() for st in sql.split(";") if st.strip()]
+        migrations.append((int(fname.split("_", 1)[0]), fname, statements))
+    return migrations
+
+
+async def schema_version(conn) -> int:
+    try:
+        return (await conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version"))).scalar()
+    except ProgrammingError:
+        # таблицы schema_version ещё нет – чистая база или база до миграций
+        await conn.rollback()
+        return 0
+
+
 async def init_db():
+    """
+    Применяет недостающие миграции. Если схема актуальна,
+    старт стоит одного запроса версии.
+    """
+    migrations = load_migrations()
+    latest = migrations[-1][0] if migrations else 0
+    async with engine.connect() as conn:
+        version = await schema_version(conn)
+    if version >= latest:
+        logger.info(f"✅ Database schema is up to date (v{version})")
+        return
+
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    logger.info("✅ Database initialized")
+        # несколько процессов не должны накатывать миграции одновременно
+        await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('ttbot_schema'))"))
+        await conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            " version INTEGER PRIMARY KEY,"
+            " name VARCHAR(255) NOT NULL,"
+            " applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW())"
+        ))
+        version = (await conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version"))).scalar()
+        for num, fname, statements in migrations:
+            if num <= version:
+                continue
+            logger.info(f"⏫ Applying migration {fname}")
+            for st in statements:
+                await conn.exec_driver_sql(st)
+            await conn.execute(
+                text("INSERT INTO schema_version (version, name) VALUES (:v, :n)"),
+                {"v": num, "n": fname}
+            )
+    logger.info(f"✅ Database migrated to v{latest}")
 
 
 async def drop_forward(update, ctx):
     return
 
 
+# ---------- PASSWORDS ----------
+# bcrypt – это ~250 мс чистого CPU; в обработчике он остановил бы весь event loop.
+# Старые записи с паролем открытым текстом (и bcrypt с меньшей стоимостью)
+# перехешируются при первом успешном входе.
+pwd_context = CryptContext(
+    schemes=["bcrypt", "plaintext"],
+    deprecated=["plaintext"],
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+password_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+
+
+async def hash_password(pwd) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, pwd_context.hash, pwd)
+
+
+async def verify_password(pwd, hashed) -> tuple[bool, str | None]:
+    """(верен ли пароль, новый хеш – если запись пора обновить до текущей схемы)."""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(password_executor, pwd_context.verify_and_update, pwd, hashed)
+    except ValueError:
+        # повреждённый хеш
+        return False, None
+
+
 # ---------- AUTH ----------
 async def start(update, ctx):
-    uid = update.effective_user.id
-    async for s in get_session():
-        admin = (await s.execute(
-            select(Administrator).where(Administrator.telegram_id == uid)
-        )).scalar_one_or_none()
-        if admin:
-            ctx.user_data.update({"admin_id": admin.id, "role": admin.role})
-            return await show_home(update, ctx)
+    admin = await lookup_admin(update.effective_user.id)
+    if admin:
+        ctx.user_data.update({"admin_id": admin[0], "role": admin[1]})
+        return await show_home(update, ctx)
 
     kb = [[InlineKeyboardButton("🔑 Войти", callback_data="auth_start")]]
 
@@ -199,38 +554,34 @@ async def auth_pass(update, ctx):
     pwd = update.message.text.strip()
     login = ctx.user_data.get("login_try")
     async for s in get_session():
-        adm = (await s.execute(select(Administrator).where(Administrator.username == login))).scalar_one_or_none()
+        adm = (await s.execute(Q_ADMIN_BY_LOGIN, {"login": login})).scalar_one_or_none()
         if not adm:
             break
-        try:
-            valid = bcrypt.verify(pwd, adm.password)
-        except ValueError:
-            valid = pwd == adm.password
+        valid, new_hash = await verify_password(pwd, adm.password)
         if not valid:
             break
+        if new_hash:
+            adm.password = new_hash
         adm.telegram_id = update.effective_user.id
         await s.commit()
+        # прежний telegram_id этого админа больше не залогинен
+        login_cache.invalidate(admin_id=adm.id)
+        login_cache.put(adm.telegram_id, (adm.id, adm.role))
         ctx.user_data.update({"admin_id": adm.id, "role": adm.role})
         await show_home(update, ctx)
         return ConversationHandler.END
 
-    await update.message.reply_text("❌ Неверно. Попробуйте снова:", reply_markup=InlineKeyboardMarkup([[back_btn()]]))
+    await update.message.reply_text("❌ Неверно. Попробуйте снова:", reply_markup=back_markup())
     return AUTH_LOGIN
 
 
 # ---------- MAIN MENU ----------
 async def show_home(update, ctx):
-    kb = [
-        [InlineKeyboardButton("➕ Новый турнир", callback_data="ct_start")],
-        [InlineKeyboardButton("📜 История", callback_data="hist")],
-        [InlineKeyboardButton("🎾 Активные", callback_data="act")],
-        [InlineKeyboardButton("⚙️ Настройки", callback_data="settings")],
-    ]
     if update.callback_query:
         await update.callback_query.answer()
-        await update.callback_query.edit_message_text("🏠 Главное меню:", reply_markup=InlineKeyboardMarkup(kb))
+        await update.callback_query.edit_message_text("🏠 Главное меню:", reply_markup=HOME_MARKUP)
     else:
-        await update.message.reply_text("🏠 Главное меню:", reply_markup=InlineKeyboardMarkup(kb))
+        await update.message.reply_text("🏠 Главное меню:", reply_markup=HOME_MARKUP)
 
 
 # ---------- CREATE TOURNAMENT ----------
@@ -246,7 +597,7 @@ async def ct_start(update, ctx):
     await update.callback_query.answer()
     await update.callback_query.edit_message_text(
         "🏆 Введите название турнира:",
-        reply_markup=InlineKeyboardMarkup([[back_btn("home")]])
+        reply_markup=back_markup("home")
     )
     return CT_NAME
 
@@ -268,7 +619,7 @@ async def ct_name(update, ctx):
 async def ct_type(update, ctx):
     ctx.user_data["ct_type"] = update.callback_query.data
     await update.callback_query.answer()
-    await update.callback_query.edit_message_text("🔢 Введите число столов (🏓):", reply_markup=InlineKeyboardMarkup([[back_btn()]]))
+    await update.callback_query.edit_message_text("🔢 Введите число столов (🏓):", reply_markup=back_markup())
     return CT_TABLES
 
 
@@ -279,7 +630,7 @@ async def ct_tables(update, ctx):
     if not txt.isdigit() or int(txt) < 1:
         return await update.message.reply_text("❌ Введите корректное число столов.")
     ctx.user_data["ct_tables"] = int(txt)
-    await update.message.reply_text("👥 Введите игроков через запятую (по рейтингу):", reply_markup=InlineKeyboardMarkup([[back_btn()]]))
+    await update.message.reply_text("👥 Введите игроков через запятую (по рейтингу):", reply_markup=back_markup())
     return CT_PLAYERS
 
 
@@ -297,8 +648,11 @@ async def ct_players(update, ctx):
         )
         s.add(tour)
         await s.flush()
-        for nm in names:
-            s.add(Player(tournament_id=tour.id, name=nm))
+        # все игроки одним INSERT ... VALUES
+        if names:
+            await s.execute(insert(Player).values([
+                {"tournament_id": tour.id, "name": nm} for nm in names
+            ]))
         await s.commit()
         tid = tour.id
     return await send_tournament_menu(update, ctx, tid)
@@ -310,7 +664,7 @@ async def history_cb(update, ctx):
         return
     await update.callback_query.answer()
     async for s in get_session():
-        tours = (await s.execute(select(Tournament).where(Tournament.status == "ended").order_by(Tournament.created_at.desc()).limit(4))).scalars().all()
+        tours = (await s.execute(Q_ENDED_TOURNAMENTS)).scalars().all()
     kb = [[InlineKeyboardButton(t.name, callback_data=f"show_{t.id}")] for t in tours]
     kb.append([back_btn()])
     await update.callback_query.edit_message_text("📜 История завершённых:", reply_markup=InlineKeyboardMarkup(kb))
@@ -321,12 +675,317 @@ async def active_cb(update, ctx):
         return
     await update.callback_query.answer()
     async for s in get_session():
-        tours = (await s.execute(select(Tournament).where(Tournament.status != "ended"))).scalars().all()
+        tours = (await s.execute(Q_ACTIVE_TOURNAMENTS)).scalars().all()
     kb = [[InlineKeyboardButton(t.name, callback_data=f"show_{t.id}")] for t in tours]
     kb.append([back_btn()])
     await update.callback_query.edit_message_text("🎾 Активные турниры:", reply_markup=InlineKeyboardMarkup(kb))
 
 
+# ---------- TOURNAMENT STATE CACHE ----------
+@dataclass
+class TournamentMenu:
+    """Снимок данных, нужных для отрисовки меню турнира."""
+    tour: Tournament
+    players: dict[int, Player]
+    active_round: Round | None = None
+    simple_done: bool = False
+    playing: list[Match] = field(default_factory=list)
+    scheduled: int = 0
+    done: int = 0
+
+    @property
+    def total(self) -> int:
+        return len(self.playing) + self.scheduled + self.done
+
+
+@dataclass
+class TournamentState:
+    """
+    Состояние турнира в памяти процесса: игроки, раунды, матчи и таблицы.
+    Объекты отсоединены от сессии и используются только для чтения.
+    """
+    tour: Tournament
+    players: dict[int, Player]
+    rounds: list[Round]
+    matches: dict[int, Match]
+    _slots: dict[int, dict[int, Match]] = field(default_factory=dict, repr=False)
+
+    @property
+    def active_round(self) -> Round | None:
+        return next((r for r in self.rounds if r.status == "pending"), None)
+
+    @property
+    def simple_done(self) -> bool:
+        return any(r.round_type == "simple" and r.status == "done" for r in self.rounds)
+
+    def last_simple(self) -> Round | None:
+        return next((r for r in reversed(self.rounds) if r.round_type == "simple"), None)
+
+    def round_matches(self, rid) -> list[Match]:
+        return [m for m in self.matches.values() if m.round_id == rid]
+
+    def round(self, rid) -> Round | None:
+        return next((r for r in self.rounds if r.id == rid), None)
+
+    def bracket_slots(self, rid) -> dict[int, Match]:
+        """Номер игры итогового раунда -> матч; индекс строится один раз на состояние."""
+        slots = self._slots.get(rid)
+        if slots is None:
+            slots = self._slots[rid] = {m.table_number: m for m in self.round_matches(rid)}
+        return slots
+
+    def tables(self) -> list[list[Player]]:
+        """Распределение игроков по таблицам последнего простого раунда."""
+        simple = self.last_simple()
+        if not simple:
+            return []
+        return [[self.players[pid] for pid in tbl] for tbl in simple.data["tables"]]
+
+    def menu(self) -> TournamentMenu:
+        menu = TournamentMenu(
+            tour=self.tour,
+            players=self.players,
+            active_round=self.active_round,
+            simple_done=self.simple_done,
+        )
+        if menu.active_round:
+            for m in self.round_matches(menu.active_round.id):
+                if m.status == "playing":
+                    menu.playing.append(m)
+                elif m.status == "done":
+                    menu.done += 1
+                else:
+                    menu.scheduled += 1
+        return menu
+
+
+async def load_tournament_state(s, tid) -> TournamentState | None:
+    """
+    Загружает состояние турнира за два запроса:
+    турнир вместе с игроками, затем все раунды вместе с матчами.
+    """
+    rows = (await s.execute(Q_TOURNAMENT_WITH_PLAYERS, {"tid": tid})).all()
+    if not rows:
+        return None
+
+    rounds: dict[int, Round] = {}
+    matches: dict[int, Match] = {}
+    for rnd, m in (await s.execute(Q_ROUNDS_WITH_MATCHES, {"tid": tid})).all():
+        rounds.setdefault(rnd.id, rnd)
+        if m is not None:
+            matches[m.id] = m
+
+    return TournamentState(
+        tour=rows[0][0],
+        players={p.id: p for _, p in rows if p is not None},
+        rounds=list(rounds.values()),
+        matches=matches,
+    )
+
+
+class TournamentCache:
+    """
+    LRU-кэш состояний турниров. Обработчики записи вызывают invalidate()
+    после коммита, поэтому чтение идёт в БД только при промахе.
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._states: OrderedDict[int, TournamentState] = OrderedDict()
+        self._versions: dict[int, int] = {}
+
+    async def get(self, tid) -> TournamentState | None:
+        state = self._states.get(tid)
+        if state is not None:
+            self.hits += 1
+            self._states.move_to_end(tid)
+            return state
+
+        self.misses += 1
+        version = self._versions.get(tid, 0)
+        async for s in get_session():
+            state = await load_tournament_state(s, tid)
+        # не кладём в кэш то, что успело устареть во время загрузки
+        if state is not None and self._versions.get(tid, 0) == version:
+            self._states[tid] = state
+            while len(self._states) > self.maxsize:
+                self._states.popitem(last=False)
+        return state
+
+    def invalidate(self, tid):
+        self._versions[tid] = self._versions.get(tid, 0) + 1
+        self._states.pop(tid, None)
+        page_cache.drop(tid)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._states),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+tournament_cache = TournamentCache(TOURNAMENT_CACHE_SIZE)
+
+
+async def get_match_players(ctx, mid, tid=None):
+    """Матч и оба игрока из кэша турнира (по умолчанию открытого); при промахе – из БД."""
+    state = await tournament_cache.get(tid or ctx.user_data.get("tid"))
+    m = state.matches.get(mid) if state else None
+    if m is not None:
+        return m, state.players[m.player1_id], state.players[m.player2_id]
+    async for s in get_session():
+        m = await s.get(Match, mid)
+        p1 = await s.get(Player, m.player1_id)
+        p2 = await s.get(Player, m.player2_id)
+    return m, p1, p2
+
+
+async def match_tournament(ctx, mid) -> int | None:
+    """
+    Турнир матча. Судья может подтвердить матч со старого табло, уже
+    открыв другой турнир, поэтому ctx.user_data["tid"] – только подсказка.
+    """
+    tid = ctx.user_data.get("tid")
+    state = await tournament_cache.get(tid) if tid else None
+    if state is not None and mid in state.matches:
+        return tid
+    async for s in get_session():
+        return (await s.execute(Q_MATCH_TOURNAMENT, {"mid": mid})).scalar_one_or_none()
+
+
+async def callback_match_tournament(update, ctx) -> int | None:
+    """Турнир матча из callback data вида <действие>_<match id>[_...]."""
+    return await match_tournament(ctx, int(update.callback_query.data.split("_")[1]))
+
+
+async def score_match_tournament(update, ctx) -> int | None:
+    """Турнир матча на табло счёта пользователя."""
+    mid = ctx.user_data.get("score_mid")
+    return await match_tournament(ctx, mid) if mid is not None else ctx.user_data.get("tid")
+
+
+# ---------- PAGINATION ----------
+MAX_MESSAGE_LEN = 4096
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", "128"))
+
+
+def paginate(lines, limit=MAX_MESSAGE_LEN) -> list[str]:
+    """
+    Склеивает строки в страницы не длиннее limit.
+    Разрыв идёт только по границам строк; строка длиннее limit режется.
+    """
+    pages: list[str] = []
+    page: list[str] = []
+    size = 0
+    for line in lines:
+        while len(line) > limit:
+            rest = line[limit:]
+            if page:
+                pages.append("\n".join(page))
+                page, size = [], 0
+            pages.append(line[:limit])
+            line = rest
+        extra = len(line) + (1 if page else 0)
+        if page and size + extra > limit:
+            pages.append("\n".join(page))
+            page, size, extra = [], 0, len(line)
+        page.append(line)
+        size += extra
+    if page:
+        pages.append("\n".join(page))
+    return pages or [""]
+
+
+class PageCache:
+    """LRU страниц по ключу (турнир, вид): листание не ходит в БД."""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._pages: OrderedDict[tuple[int, str], list[str]] = OrderedDict()
+
+    def get(self, tid, view) -> list[str] | None:
+        pages = self._pages.get((tid, view))
+        if pages is not None:
+            self._pages.move_to_end((tid, view))
+        return pages
+
+    def put(self, tid, view, pages):
+        self._pages[(tid, view)] = pages
+        while len(self._pages) > self.maxsize:
+            self._pages.popitem(last=False)
+
+    def drop(self, tid):
+        for key in [k for k in self._pages if k[0] == tid]:
+            del self._pages[key]
+
+
+page_cache = PageCache(PAGE_CACHE_SIZE)
+
+# вид -> callback кнопки «Назад» (у итогов раунда её нет – это отдельное сообщение)
+PAGE_BACK = {"hist": "show_{tid}", "tables": "show_{tid}"}
+
+
+async def render_view(tid, view) -> list[str]:
+    if view == "hist":
+        async for s in get_session():
+            history = await load_history(s, tid)
+        return history_lines(history)
+    state = await tournament_cache.get(tid)
+    if view == "tables":
+        return tables_lines(state)
+    if view == "places":
+        return places_lines(state)
+    return summary_lines(state)
+
+
+async def get_pages(tid, view) -> list[str]:
+    pages = page_cache.get(tid, view)
+    if pages is None:
+        pages = paginate(await render_view(tid, view))
+        page_cache.put(tid, view, pages)
+    return pages
+
+
+async def send_pages(update, ctx, tid, view, page=0, new_message=False):
+    """Показывает страницу вида с кнопками ◀️/▶️ (редактирует или шлёт новое)."""
+    pages = await get_pages(tid, view)
+    page = max(0, min(page, len(pages) - 1))
+
+    kb = []
+    if len(pages) > 1:
+        nav = []
+        if page > 0:
+            nav.append(InlineKeyboardButton("◀️", callback_data=f"page_{view}_{tid}_{page - 1}"))
+        nav.append(InlineKeyboardButton(f"{page + 1}/{len(pages)}", callback_data="noop"))
+        if page < len(pages) - 1:
+            nav.append(InlineKeyboardButton("▶️", callback_data=f"page_{view}_{tid}_{page + 1}"))
+        kb.append(nav)
+    if view in PAGE_BACK:
+        kb.append([InlineKeyboardButton("⬅️ Назад", callback_data=PAGE_BACK[view].format(tid=tid))])
+
+    markup = InlineKeyboardMarkup(kb) if kb else None
+    if new_message or not update.callback_query:
+        await ctx.bot.send_message(
+            chat_id=update.effective_chat.id, text=pages[page],
+            parse_mode="HTML", reply_markup=markup
+        )
+    else:
+        await update.callback_query.edit_message_text(
+            pages[page], parse_mode="HTML", reply_markup=markup
+        )
+
+
+async def page_cb(update, ctx):
+    await update.callback_query.answer()
+    _, view, tid, page = update.callback_query.data.split("_")
+    await send_pages(update, ctx, int(tid), view, int(page))
+
+
 # ---------- TOURNAMENT MENU ----------
 async def send_tournament_menu(update, ctx, tid):
     """
@@ -336,23 +995,16 @@ async def send_tournament_menu(update, ctx, tid):
     """
     ctx.user_data["tid"] = tid
 
-    # Загрузка данных
-    async for s in get_session():
-        tour = await s.get(Tournament, tid)
-        players = (await s.execute(
-            select(Player).where(Player.tournament_id == tid)
-        )).scalars().all()
-        active_rnd = (await s.execute(
-            select(Round)
-            .where(Round.tournament_id == tid, Round.status == "pending")
-        )).scalar_one_or_none()
+    # Загрузка данных (из кэша, при промахе – из БД)
+    menu = (await tournament_cache.get(tid)).menu()
+    tour, active_rnd = menu.tour, menu.active_round
 
     # Заголовок
     txt = (
         f"🏆 <b>{tour.name}</b>\n"
         f"📂 Тип: {tour.tournament_type}\n"
         f"🏓 Столов: {tour.data['tables']}\n"
-        f"👥 Игроков: {len(players)}\n"
+        f"👥 Игроков: {len(menu.players)}\n"
         f"📌 Статус: {tour.status}\n"
     )
 
@@ -364,21 +1016,9 @@ async def send_tournament_menu(update, ctx, tid):
 
     else:
         # Регистрация/активный турнир: прежний функционал
-        simple_done = None
-        async for s in get_session():
-            simple_done = (await s.execute(
-                select(Round)
-                .where(
-                    Round.tournament_id == tid,
-                    Round.round_type == "simple",
-                    Round.status == "done"
-                )
-                .order_by(Round.created_at.desc())
-            )).scalars().first()
-
         if not active_rnd:
             # Нет текущего раунда
-            if simple_done:
+            if menu.simple_done:
                 # Простая часть завершена – предлагаем итоговый
                 kb.append([InlineKeyboardButton("▶️ Начать итоговый", callback_data="round_final")])
             else:
@@ -387,31 +1027,24 @@ async def send_tournament_menu(update, ctx, tid):
                 kb.append([InlineKeyboardButton("▶️ Начать итоговый", callback_data="round_final")])
         else:
             # Есть незавершённый раунд – показываем статистику и кнопки
-            async for s in get_session():
-                matches_all = (await s.execute(
-                    select(Match).where(Match.round_id == active_rnd.id)
-                )).scalars().all()
-            playing = [m for m in matches_all if m.status == "playing"]
-            pending = [m for m in matches_all if m.status == "scheduled"]
-            done    = [m for m in matches_all if m.status == "done"]
-
             txt += (
                 f"\n🔄 Раунд: {active_rnd.round_type}\n"
-                f"🏃 В процессе: {len(playing)}, ⏳ Осталось: {len(pending)}, ✅ Завершено: {len(done)}\n"
+                f"🏃 В процессе: {len(menu.playing)}, ⏳ Осталось: {menu.scheduled}, ✅ Завершено: {menu.done}\n"
             )
 
             # Кнопки для игр в процессе
-            for m in playing:
-                p1 = next(p for p in players if p.id == m.player1_id)
-                p2 = next(p for p in players if p.id == m.player2_id)
-                kb.append([InlineKeyboardButton(f"{p1.name} : {p2.name}", callback_data=f"match_{m.id}")])
+            for m in menu.playing:
+                p1 = menu.players[m.player1_id]
+                p2 = menu.players[m.player2_id]
+                court = f"🏓{m.court} " if m.court else ""
+                kb.append([InlineKeyboardButton(f"{court}{p1.name} : {p2.name}", callback_data=f"match_{m.id}")])
 
             # Начать новую игру
-            if len(playing) < tour.data["tables"] and pending:
+            if len(menu.playing) < tour.data["tables"] and menu.scheduled:
                 kb.append([InlineKeyboardButton("▶️ Начать игру", callback_data="start_match")])
 
             # Завершить раунд
-            if len(done) == len(matches_all):
+            if menu.done == menu.total:
                 kb.append([InlineKeyboardButton("✅ Завершить раунд", callback_data="finish_round")])
 
             # Показать распределение по таблицам
@@ -452,6 +1085,25 @@ async def match_res(update, ctx):
     )
 
 
+def points_word(n) -> str:
+    """Правильное склонение слова «балл» для числа n."""
+    if n % 10 == 1 and n % 100 != 11:
+        return "балл"
+    if n % 10 in (2, 3, 4) and n % 100 not in (12, 13, 14):
+        return "балла"
+    return "баллов"
+
+
+def tables_lines(state) -> list[str]:
+    lines = ["📋 <b>Таблицы и текущие баллы:</b>", ""]
+    for idx, tbl in enumerate(state.tables(), start=1):
+        lines.append(f"Таблица {idx}:")
+        for p in tbl:
+            lines.append(f"{p.name} — {p.score} {points_word(p.score)}")
+        lines.append("")
+    return lines
+
+
 async def show_tables(update, ctx):
     """
     Показывает распределение по столам вместе с текущими баллами участников
@@ -460,48 +1112,7 @@ async def show_tables(update, ctx):
     await update.callback_query.answer()
     # извлекаем tid из callback_data "show_tables_<tid>"
     tid = int(update.callback_query.data.split("_")[2])
-
-    async for s in get_session():
-        # берём последний простой раунд (pending или done)
-        simple = (await s.execute(
-            select(Round)
-            .where(
-                Round.tournament_id == tid,
-                Round.round_type == "simple"
-            )
-            .order_by(Round.created_at.desc())
-        )).scalars().first()
-        # все игроки турнира с текущими очками
-        players = (await s.execute(
-            select(Player).where(Player.tournament_id == tid)
-        )).scalars().all()
-
-    # маппинг id→Player
-    player_map = {p.id: p for p in players}
-    tables = simple.data["tables"]
-
-    # Формируем сообщение
-    msg = "📋 <b>Таблицы и текущие баллы:</b>\n\n"
-    for idx, tbl_ids in enumerate(tables, start=1):
-        msg += f"Таблица {idx}:\n"
-        for pid in tbl_ids:
-            p = player_map[pid]
-            # правильное склонение слова "балл"
-            suffix = "ов"
-            if p.score % 10 == 1 and p.score % 100 != 11:
-                suffix = ""
-            elif p.score % 10 in (2, 3, 4) and p.score % 100 not in (12, 13, 14):
-                suffix = "а"
-            msg += f"{p.name} — {p.score} балл{suffix}\n"
-        msg += "\n"
-
-    # кнопка "Назад" в меню турнира
-    kb = [[InlineKeyboardButton("⬅️ Назад", callback_data=f"show_{tid}")]]
-    await update.callback_query.edit_message_text(
-        msg,
-        parse_mode="HTML",
-        reply_markup=InlineKeyboardMarkup(kb)
-    )
+    await send_pages(update, ctx, tid, "tables")
 
 
 # ---------- HANDLE SCORE INPUT ----------
@@ -514,9 +1125,8 @@ async def handle_match_score(update, ctx):
     ctx.user_data["pending_score"] = score
 
     # fetch winner for confirmation text
-    async for s in get_session():
-        m = await s.get(Match, mid)
-        winner = await s.get(Player, m.player1_id if who==1 else m.player2_id)
+    _, p1, p2 = await get_match_players(ctx, mid)
+    winner = p1 if who == 1 else p2
 
     kb = [[
         InlineKeyboardButton(
@@ -603,6 +1213,43 @@ async def start_match(update, ctx):
     )
 
 
+ROUND_TYPE_NAMES = {"simple": "простой", "final": "итоговый"}
+
+
+async def load_history(s, tid) -> list[tuple[Round, list[tuple[Match, str, str]]]]:
+    """
+    Вся история турнира одним запросом: раунды по порядку создания,
+    в каждом – матчи по таблицам вместе с именами обоих игроков.
+    """
+    rows = (await s.execute(Q_HISTORY, {"tid": tid})).all()
+
+    history: list[tuple[Round, list[tuple[Match, str, str]]]] = []
+    for rnd, m, name1, name2 in rows:
+        if not history or history[-1][0].id != rnd.id:
+            history.append((rnd, []))
+        history[-1][1].append((m, name1, name2))
+    return history
+
+
+def history_lines(history) -> list[str]:
+    """Текст истории игр по раундам и таблицам."""
+    lines = ["📖 <b>История игр:</b>"]
+    for rnd_no, (rnd, matches) in enumerate(history, start=1):
+        lines.append("")
+        lines.append(f"🔄 <b>Раунд {rnd_no}</b> — {ROUND_TYPE_NAMES.get(rnd.round_type, rnd.round_type)}")
+        table = None
+        for m, p1, p2 in matches:
+            score = (m.result or {}).get("score", "-")
+            if rnd.round_type == "final":
+                lines.append(f"Игра {m.table_number}: {p1} : {p2} — {score}")
+                continue
+            if m.table_number != table:
+                table = m.table_number
+                lines.append(f"Таблица {table}:")
+            lines.append(f"{p1} : {p2} — {score}")
+    return lines
+
+
 async def show_rounds_history(update, ctx):
     """
     Показывает все игры данного турнира (для завершённых турниров).
@@ -610,38 +1257,8 @@ async def show_rounds_history(update, ctx):
     await update.callback_query.answer()
     tid = int(update.callback_query.data.split("_")[1])
 
-    async for s in get_session():
-        # получить все раунды и матчи
-        rounds = (await s.execute(
-            select(Round).where(Round.tournament_id == tid).order_by(Round.created_at)
-        )).scalars().all()
-        all_matches = []
-        for rnd in rounds:
-            mlist = (await s.execute(
-                select(Match).where(Match.round_id == rnd.id)
-            )).scalars().all()
-            all_matches.extend(mlist)
-        # загрузить всех участвовавших игроков
-        pids = {pid for m in all_matches for pid in (m.player1_id, m.player2_id)}
-        players = (await s.execute(
-            select(Player).where(Player.id.in_(pids))
-        )).scalars().all()
-        player_map = {p.id: p.name for p in players}
-
-    # Формирование текста истории игр
-    text = "📖 <b>История игр:</b>\n"
-    for m in all_matches:
-        p1 = player_map[m.player1_id]
-        p2 = player_map[m.player2_id]
-        score = m.result.get("score", "-")
-        text += f"\n{p1} : {p2} — {score}"
-
-    # Кнопка назад в меню турнира
-    kb = [[InlineKeyboardButton("⬅️ Назад", callback_data=f"show_{tid}")]]
-    await update.callback_query.edit_message_text(
-        text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(kb)
-    )
-    
+    await send_pages(update, ctx, tid, "hist")
+
 
 async def start_match(update, ctx):
     logger.info("▶️ start_match called")
@@ -656,88 +1273,71 @@ async def start_match(update, ctx):
         logger.warning("start_match: tid is None, aborting")
         return
 
-    async for s in get_session():
-        active_rnd = (await s.execute(
-            select(Round).where(
-                Round.tournament_id == tid,
-                Round.status == "pending"
-            )
-        )).scalar_one_or_none()
-        logger.info(f"start_match: active_rnd = {active_rnd!r}")
+    state = await tournament_cache.get(tid)
+    active_rnd = state.active_round
+    logger.info(f"start_match: active_rnd = {active_rnd!r}")
 
-        if not active_rnd:
-            logger.info("start_match: no pending round, returning to menu")
-            return await send_tournament_menu(update, ctx, tid)
+    if not active_rnd:
+        logger.info("start_match: no pending round, returning to menu")
+        return await send_tournament_menu(update, ctx, tid)
 
-        pending = (await s.execute(
-            select(Match).where(
-                Match.round_id == active_rnd.id,
-                Match.status == "scheduled"
-            )
-        )).scalars().all()
-        logger.info(f"start_match: pending matches count = {len(pending)}")
+    # свободные пары, самые отдохнувшие игроки первыми
+    sched = schedulers.get(state, active_rnd.id)
+    available = [state.matches[mid] for mid in sched.ranked()]
+    logger.info(f"start_match: available matches count = {len(available)}")
 
-        playing_matches = (await s.execute(
-            select(Match).where(
-                Match.round_id == active_rnd.id,
-                Match.status == "playing"
-            )
-        )).scalars().all()
-        logger.info(f"start_match: playing matches count = {len(playing_matches)}")
-        playing_ids = {
-            pid
-            for m in playing_matches
-            for pid in (m.player1_id, m.player2_id)
-        }
-        logger.info(f"start_match: currently playing player ids = {playing_ids}")
-
-        available = [
-            m for m in pending
-            if m.player1_id not in playing_ids and m.player2_id not in playing_ids
-        ]
-        logger.info(f"start_match: available matches count = {len(available)}")
-
-        if not available:
-            logger.info("start_match: no available matches due to players busy")
-            await update.callback_query.answer(
-                "Нет доступных пар для старта.", show_alert=True
-            )
-            return await send_tournament_menu(update, ctx, tid)
+    if not available:
+        logger.info("start_match: no available matches due to players busy")
+        await update.callback_query.answer(
+            "Нет доступных пар для старта.", show_alert=True
+        )
+        return await send_tournament_menu(update, ctx, tid)
 
-        ids = {m.player1_id for m in available} | {m.player2_id for m in available}
-        logger.info(f"start_match: loading players with ids = {ids}")
-        players = (await s.execute(
-            select(Player).where(Player.id.in_(ids))
-        )).scalars().all()
-        player_map = {p.id: p for p in players}
-        logger.info(f"start_match: loaded players = {list(player_map.keys())}")
+    player_map = state.players
 
     kb = [
         [
             InlineKeyboardButton(
-                f"{player_map[m.player1_id].name} : {player_map[m.player2_id].name}",
+                f"{'⭐ ' if i == 0 else ''}{player_map[m.player1_id].name} : {player_map[m.player2_id].name}",
                 callback_data=f"play_{m.id}"
             )
         ]
-        for m in available
+        for i, m in enumerate(available)
     ]
     kb.append([ back_btn(f"show_{tid}") ])
 
     logger.info("start_match: editing message with match list")
     await update.callback_query.edit_message_text(
-        "Выберите пару для старта:",
+        "Выберите пару для старта (⭐ – игроки отдыхали дольше всех):",
         reply_markup=InlineKeyboardMarkup(kb)
     )
 
 
+@idempotent
+@serialized(tournament_of=callback_match_tournament)
 async def play_match(update, ctx):
     await update.callback_query.answer()
     mid = int(update.callback_query.data.split("_", 1)[1])
+    tid = await match_tournament(ctx, mid)
+    state = await tournament_cache.get(tid)
     async for s in get_session():
         m = await s.get(Match, mid)
+        if m.status != "scheduled":
+            # уже запущена диспетчером или другим судьёй
+            return await send_tournament_menu(update, ctx, tid)
+        sched = schedulers.get(state, m.round_id)
+        court = sched.take_court() if sched is not None else None
         m.status = "playing"
-        await s.commit()
-    return await send_tournament_menu(update, ctx, ctx.user_data["tid"])
+        m.court = court
+        try:
+            await s.commit()
+        except Exception:
+            schedulers.drop(m.round_id)
+            raise
+    if sched is not None:
+        sched.start(mid, court)
+    tournament_cache.invalidate(tid)
+    return await send_tournament_menu(update, ctx, tid)
 
 
 async def show_tournament(update, ctx):
@@ -754,9 +1354,8 @@ async def export_json(update, ctx):
         return
     await update.callback_query.answer()
     tid = ctx.user_data["tid"]
-    async for s in get_session():
-        tour = await s.get(Tournament, tid)
-        players = (await s.execute(select(Player).where(Player.tournament_id == tid))).scalars().all()
+    state = await tournament_cache.get(tid)
+    tour, players = state.tour, state.players.values()
     data = {
         "id": tid,
         "name": tour.name,
@@ -770,32 +1369,244 @@ async def export_json(update, ctx):
     await ctx.bot.send_document(update.effective_chat.id, InputFile(fname), filename=fname)
 
 
+# ---------- ROUNDS ----------
+async def add_round(s, rnd) -> bool:
+    """
+    Добавляет раунд в сессию. False (с откатом), если у турнира уже есть
+    незавершённый раунд – это гарантирует индекс rounds_one_pending_idx.
+    """
+    s.add(rnd)
+    try:
+        await s.flush()
+    except IntegrityError:
+        await s.rollback()
+        logger.warning(f"Tournament {rnd.tournament_id} already has a pending round")
+        return False
+    return True
+
+
+# ---------- SCHEDULING ----------
+@functools.lru_cache(maxsize=None)
+def circle_rounds(size) -> tuple[tuple[tuple[int, int], ...], ...]:
+    """
+    Круговая система методом вращения: туры из пар мест (с нуля).
+    За тур каждый играет не больше одного раза; при нечётном size один
+    игрок в туре отдыхает.
+    """
+    idx = list(range(size)) + ([None] if size % 2 else [])
+    n = len(idx)
+    rounds = []
+    for _ in range(n - 1):
+        pairs = ((idx[i], idx[n - 1 - i]) for i in range(n // 2))
+        rounds.append(tuple((a, b) for a, b in pairs if a is not None and b is not None))
+        idx = [idx[0], idx[-1], *idx[1:-1]]
+    return tuple(rounds)
+
+
+class RestScheduler:
+    """
+    Очередь игр раунда с учётом отдыха игроков. Хранит ожидающие игры в
+    порядке расписания, идущие игры, «время» последней игры каждого
+    игрока (номер завершения) и пул свободных столов зала.
+    add/start/finish – O(1) (стол – O(log courts)), выбор – O(pending).
+    """
+
+    def __init__(self, courts=0):
+        self.pending: dict[int, tuple[int, int]] = {}  # match id -> игроки, по расписанию
+        self.playing: dict[int, tuple[int, int]] = {}
+        self.last: dict[int, int] = {}  # player id -> номер завершения его последней игры
+        self.tick = 0
+        self.free: list[int] = list(range(1, courts + 1))  # heap свободных столов
+        self.court: dict[int, int] = {}  # идущая игра -> стол
+        # столы, придержанные при восстановлении за играми без стола
+        self.withheld: list[int] = []
+
+    @classmethod
+    def from_matches(cls, matches, courts=0) -> "RestScheduler":
+        """Восстанавливает очередь по матчам раунда (порядок завершения – по id)."""
+        sched = cls()
+        for m in sorted(matches, key=lambda m: m.id):
+            sched.add(m.id, m.player1_id, m.player2_id)
+            if m.status == "playing":
+                sched.start(m.id, m.court)
+            elif m.status == "done":
+                sched.start(m.id)
+                sched.finish(m.id)
+        taken = set(sched.court.values())
+        free = [c for c in range(1, courts + 1) if c not in taken]
+        # игры, начатые до появления столов, тоже занимают по столу
+        untracked = min(len(sched.playing) - len(sched.court), len(free))
+        sched.free, sched.withheld = free[:len(free) - untracked], free[len(free) - untracked:]
+        return sched
+
+    def add(self, mid, p1, p2):
+        self.pending[mid] = (p1, p2)
+
+    def take_court(self) -> int | None:
+        return heapq.heappop(self.free) if self.free else None
+
+    def release(self, court):
+        if court is not None:
+            heapq.heappush(self.free, court)
+
+    def start(self, mid, court=None):
+        pair = self.pending.pop(mid, None)
+        if pair is not None:
+            self.playing[mid] = pair
+            if court is not None:
+                self.court[mid] = court
+
+    def finish(self, mid):
+        was_playing = mid in self.playing
+        pair = self.playing.pop(mid, None) or self.pending.pop(mid, None)
+        if pair is not None:
+            self.tick += 1
+            for pid in pair:
+                self.last[pid] = self.tick
+        court = self.court.pop(mid, None)
+        if court is None and was_playing and self.withheld:
+            # игра без стола освобождает один из придержанных за такими играми
+            court = self.withheld.pop()
+        self.release(court)
+
+    def rest(self, pid) -> int:
+        """Сколько игр раунда завершилось с последней игры игрока."""
+        return self.tick - self.last.get(pid, -1)
+
+    def ranked(self) -> list[int]:
+        """Игры, оба игрока которых свободны: самые отдохнувшие первыми, затем по расписанию."""
+        busy = {pid for pair in self.playing.values() for pid in pair}
+        ready = [
+            (-min(self.rest(p1), self.rest(p2)), -self.rest(p1) - self.rest(p2), mid)
+            for mid, (p1, p2) in self.pending.items()
+            if p1 not in busy and p2 not in busy
+        ]
+        ready.sort(key=lambda r: r[:2])  # sort стабилен: при равенстве – порядок расписания
+        return [mid for _, _, mid in ready]
+
+    def pick(self, free_tables) -> list[int]:
+        """До free_tables игр без общих игроков, чтобы занять все свободные столы."""
+        chosen, used = [], set()
+        for mid in self.ranked():
+            if len(chosen) == free_tables:
+                break
+            pair = self.pending[mid]
+            if used.isdisjoint(pair):
+                chosen.append(mid)
+                used.update(pair)
+        return chosen
+
+
+class SchedulerRegistry:
+    """
+    Планировщики активных раундов. Строятся по состоянию турнира один раз,
+    дальше обновляются событиями старта и завершения игр.
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._items: OrderedDict[int, RestScheduler] = OrderedDict()
+
+    def get(self, state, rid) -> RestScheduler | None:
+        """
+        Планировщик раунда rid; строится только по состоянию турнира, которому
+        раунд принадлежит (иначе None), чтобы не закэшировать пустую очередь.
+        """
+        sched = self._items.get(rid)
+        if sched is None:
+            if state is None or state.round(rid) is None:
+                return None
+            sched = self._items[rid] = RestScheduler.from_matches(
+                state.round_matches(rid), state.tour.data["tables"]
+            )
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        self._items.move_to_end(rid)
+        return sched
+
+    def peek(self, rid) -> RestScheduler | None:
+        return self._items.get(rid)
+
+    def drop(self, rid):
+        self._items.pop(rid, None)
+
+
+schedulers = SchedulerRegistry(TOURNAMENT_CACHE_SIZE)
+
+
+# ---------- DISPATCH ----------
+async def dispatch_matches(s, sched) -> list[tuple[int, int, int, int]]:
+    """
+    Сажает лучшие готовые игры за свободные столы в текущей транзакции
+    и отмечает их в планировщике. Возвращает [(match id, стол, игрок 1, игрок 2)].
+    """
+    picks = sched.pick(len(sched.free))
+    if not picks:
+        return []
+    courts = {mid: sched.take_court() for mid in picks}
+    rows = (await s.execute(
+        sa_update(Match)
+        .where(Match.id.in_(picks), Match.status == "scheduled")
+        .values(status="playing", court=case(courts, value=Match.id))
+        .returning(Match.id)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+    started = []
+    for mid, court in courts.items():
+        if mid in rows:
+            started.append((mid, court, *sched.pending[mid]))
+            sched.start(mid, court)
+        else:
+            sched.release(court)
+    return started
+
+
+async def dispatch_round(tid) -> list[tuple[int, int, int, int]]:
+    """Заполняет свободные столы активного раунда турнира (например, сразу после создания)."""
+    state = await tournament_cache.get(tid)
+    rnd = state.active_round if state else None
+    if rnd is None:
+        return []
+    sched = schedulers.get(state, rnd.id)
+    async for s in get_session():
+        try:
+            started = await dispatch_matches(s, sched)
+            await s.commit()
+        except Exception:
+            schedulers.drop(rnd.id)
+            raise
+    if started:
+        tournament_cache.invalidate(tid)
+    return started
+
+
+async def notify_started(update, ctx, tid, started):
+    """Сообщение в чат: какие игры и за какими столами начинаются."""
+    if not started:
+        return
+    players = (await tournament_cache.get(tid)).players
+    lines = [
+        f"🏓 Стол {court}: {players[p1].name} : {players[p2].name}"
+        for _, court, p1, p2 in sorted(started, key=lambda st: st[1])
+    ]
+    await ctx.bot.send_message(update.effective_chat.id, "▶️ Начинайте игры:\n" + "\n".join(lines))
+
+
 # ---------- SIMPLE ROUND ----------
+@idempotent
+@serialized()
 async def round_simple(update, ctx):
     if await require_login(update, ctx):
-        return
+        return NOT_APPLIED
     await update.callback_query.answer()
     tid = ctx.user_data["tid"]
 
     # Создаём простой раунд и матчи
     async for s in get_session():
         # загружаем всех игроков, сортируя по текущему счету (но до первого раунда все 0)
-        players = (await s.execute(
-            select(Player)
-            .where(Player.tournament_id == tid)
-            .order_by(Player.score.desc())
-        )).scalars().all()
-        n = len(players)
-        # определяем число столов: tcount чётно, и размер каждой группы от 4 до 7
-        for tcount in range(2, n // 4 + 3, 2):
-            size = -(-n // tcount)
-            if 4 <= size <= 7:
-                break
-
-        # разбиваем по кругу
-        tables: list[list[Player]] = [[] for _ in range(tcount)]
-        for p, idx in zip(players, cycle(range(tcount))):
-            tables[idx].append(p)
+        players = (await s.execute(Q_PLAYERS_BY_SCORE, {"tid": tid})).scalars().all()
+        # рассадка по таблицам змейкой по рейтингу
+        tables: list[list[Player]] = [[players[r] for r in tbl] for tbl in seating(len(players))]
 
         # сохраняем раунд
         rnd = Round(
@@ -803,18 +1614,22 @@ async def round_simple(update, ctx):
             round_type="simple",
             data={"tables": [[p.id for p in tbl] for tbl in tables]}
         )
-        s.add(rnd)
-        await s.flush()
+        if not await add_round(s, rnd):
+            tournament_cache.invalidate(tid)
+            return await send_tournament_menu(update, ctx, tid)
 
-        # создаём все пары внутри каждой таблицы
-        for idx, tbl in enumerate(tables, start=1):
-            for p1, p2 in combinations(tbl, 2):
-                s.add(Match(
-                    round_id=rnd.id,
-                    table_number=idx,
-                    player1_id=p1.id,
-                    player2_id=p2.id
-                ))
+        # все пары внутри каждой таблицы одним INSERT ... VALUES, по турам
+        # кругового метода: id матчей задают порядок расписания
+        tours = [circle_rounds(len(tbl)) for tbl in tables]
+        match_rows = [
+            {"round_id": rnd.id, "table_number": idx, "player1_id": tbl[a].id, "player2_id": tbl[b].id}
+            for tour_no in range(max(map(len, tours), default=0))
+            for idx, (tbl, rounds) in enumerate(zip(tables, tours), start=1)
+            if tour_no < len(rounds)
+            for a, b in rounds[tour_no]
+        ]
+        if match_rows:
+            await s.execute(insert(Match).values(match_rows))
 
         # ставим статус турниру "active"
         await s.execute(
@@ -823,77 +1638,63 @@ async def round_simple(update, ctx):
             .values(status="active")
         )
         await s.commit()
+    tournament_cache.invalidate(tid)
+    await notify_started(update, ctx, tid, await dispatch_round(tid))
 
     # Показать меню турнира
     return await send_tournament_menu(update, ctx, tid)
 
 
 # ---------- FINAL ROUND ----------
+@idempotent
+@serialized()
 async def round_final(update, ctx):
     if await require_login(update, ctx):
-        return
+        return NOT_APPLIED
     await update.callback_query.answer()
     tid = ctx.user_data["tid"]
 
     async for s in get_session():
         # find latest completed simple round
-        simple = (await s.execute(
-            select(Round)
-            .where(
-                Round.tournament_id == tid,
-                Round.round_type == "simple",
-                Round.status == "done"
-            )
-            .order_by(Round.created_at.desc())
-        )).scalars().first()
+        simple = (await s.execute(Q_LAST_SIMPLE_DONE, {"tid": tid})).scalars().first()
         if not simple:
-            return await update.callback_query.edit_message_text(
+            await update.callback_query.edit_message_text(
                 "❌ Сначала завершите простой раунд."
             )
+            return NOT_APPLIED
 
-        # load all players and split into the two tables
-        all_players = (await s.execute(
-            select(Player).where(Player.tournament_id == tid)
-        )).scalars().all()
-        table1_ids, table2_ids = simple.data["tables"][0], simple.data["tables"][1]
-        table1 = [p for p in all_players if p.id in table1_ids]
-        table2 = [p for p in all_players if p.id in table2_ids]
-
-        # sort each table by score descending
-        table1_sorted = sorted(table1, key=lambda p: p.score, reverse=True)
-        table2_sorted = sorted(table2, key=lambda p: p.score, reverse=True)
-
-        # bracket matches as specified:
-        bracket = [
-            # 1 игра: 1 место 1 таблицы vs 4 место 2 таблицы
-            (table1_sorted[0].id, table2_sorted[3].id),
-            # 2 игра: 1 место 2 таблицы vs 4 место 1 таблицы
-            (table2_sorted[0].id, table1_sorted[3].id),
-            # 3 игра: 2 место 1 таблицы vs 3 место 2 таблицы
-            (table1_sorted[1].id, table2_sorted[2].id),
-            # 4 игра: 2 место 2 таблицы vs 3 место 1 таблицы
-            (table2_sorted[1].id, table1_sorted[2].id),
-        ]
+        # стороны сетки – таблицы простого раунда по набранным очкам
+        players = (await s.execute(Q_PLAYERS_BY_SCORE, {"tid": tid})).scalars().all()
+        sides = bracket_sides(simple.data["tables"], players)
+        n1, n2 = len(sides[0]), len(sides[1])
+        if n1 + n2 < 2:
+            await update.callback_query.edit_message_text(
+                "❌ Для итогового раунда нужно хотя бы два игрока.",
+                reply_markup=back_markup(f"show_{tid}")
+            )
+            return NOT_APPLIED
+        bracket = compile_bracket(n1, n2)
 
         # create final-round record
         rnd = Round(
             tournament_id=tid,
             round_type="final",
-            data={"matches": bracket}
+            data={"bracket": [n1, n2], "sides": sides}
         )
-        s.add(rnd)
-        await s.flush()
+        if not await add_round(s, rnd):
+            tournament_cache.invalidate(tid)
+            return await send_tournament_menu(update, ctx, tid)
 
-        # schedule the 4 first matches
-        for idx, (a, b) in enumerate(bracket, start=1):
-            s.add(
-                Match(
-                    round_id=rnd.id,
-                    table_number=idx,
-                    player1_id=a,
-                    player2_id=b
-                )
-            )
+        # назначаем игры первого круга, номер игры – table_number
+        await s.execute(insert(Match).values([
+            {
+                "round_id": rnd.id,
+                "table_number": g.number,
+                "player1_id": sides[g.slots[0][1]][g.slots[0][2]],
+                "player2_id": sides[g.slots[1][1]][g.slots[1][2]],
+            }
+            for g in bracket.opening()
+        ]))
 
         # mark tournament active if not already
         await s.execute(
@@ -902,23 +1703,27 @@ async def round_final(update, ctx):
             .values(status="active")
         )
         await s.commit()
+    tournament_cache.invalidate(tid)
+    await notify_started(update, ctx, tid, await dispatch_round(tid))
 
     # return to the updated menu
     return await send_tournament_menu(update, ctx, tid)
 
-def build_scoreboard_markup(p1, p2, s1, s2, mid):
+@functools.lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def build_scoreboard_markup(name1, name2, s1, s2, mid):
+    """Табло счёта: 4×4 состояния на матч, поэтому результат кэшируется."""
     # Row for player1
     row1 = []
     if s1 > 0:
         row1.append(InlineKeyboardButton("➖", callback_data=f"dec_{mid}_1"))
-    row1.append(InlineKeyboardButton(f"{p1.name}: {s1}", callback_data="noop"))
+    row1.append(InlineKeyboardButton(f"{name1}: {s1}", callback_data="noop"))
     if s1 < 3:
         row1.append(InlineKeyboardButton("➕", callback_data=f"inc_{mid}_1"))
     # Row for player2
     row2 = []
     if s2 > 0:
         row2.append(InlineKeyboardButton("➖", callback_data=f"dec_{mid}_2"))
-    row2.append(InlineKeyboardButton(f"{p2.name}: {s2}", callback_data="noop"))
+    row2.append(InlineKeyboardButton(f"{name2}: {s2}", callback_data="noop"))
     if s2 < 3:
         row2.append(InlineKeyboardButton("➕", callback_data=f"inc_{mid}_2"))
     # Confirm button
@@ -926,6 +1731,21 @@ def build_scoreboard_markup(p1, p2, s1, s2, mid):
     return InlineKeyboardMarkup([row1, row2, row3])
 
 
+async def init_score_ctx(ctx, mid):
+    """
+    Заводит компактный контекст табло в user_data: id матча, имена игроков
+    и счёт по сетам. Дальше ➕/➖ перерисовывают табло без обращений к БД.
+    """
+    _, p1, p2 = await get_match_players(ctx, mid)
+    ctx.user_data.update({
+        "score_mid": mid,
+        "score_names": [p1.name, p2.name],
+        "score_1": 0,
+        "score_2": 0,
+    })
+    return p1.name, p2.name
+
+
 
 
 # ---------- MATCH ----------
@@ -936,21 +1756,13 @@ async def match_cb(update, ctx):
     """
     await update.callback_query.answer()
     mid = int(update.callback_query.data.split("_", 1)[1])
-    # initialize scores
-    ctx.user_data["score_mid"] = mid
-    ctx.user_data["score_1"] = 0
-    ctx.user_data["score_2"] = 0
-
-    # load the two players
-    async for s in get_session():
-        m  = await s.get(Match, mid)
-        p1 = await s.get(Player, m.player1_id)
-        p2 = await s.get(Player, m.player2_id)
+    # initialize scores and the two player names
+    name1, name2 = await init_score_ctx(ctx, mid)
 
     # show interactive keyboard
     await update.callback_query.edit_message_text(
         "📝 Установите счёт встречи:",
-        reply_markup=build_scoreboard_markup(p1, p2, 0, 0, mid)
+        reply_markup=build_scoreboard_markup(name1, name2, 0, 0, mid)
     )
 
 
@@ -959,18 +1771,11 @@ async def match_cb(update, ctx):
 async def match_res(update, ctx):
     await update.callback_query.answer()
     mid = int(update.callback_query.data.split("_")[1])
-    ctx.user_data["score_mid"] = mid
-    ctx.user_data["score_1"] = 0
-    ctx.user_data["score_2"] = 0
-
-    async for s in get_session():
-        m  = await s.get(Match, mid)
-        p1 = await s.get(Player, m.player1_id)
-        p2 = await s.get(Player, m.player2_id)
+    name1, name2 = await init_score_ctx(ctx, mid)
 
     await update.callback_query.edit_message_text(
         "📝 Установите счёт встречи:",
-        reply_markup=build_scoreboard_markup(p1, p2, 0, 0, mid)
+        reply_markup=build_scoreboard_markup(name1, name2, 0, 0, mid)
     )
 
 
@@ -980,6 +1785,9 @@ async def adjust_score(update, ctx):
     await update.callback_query.answer()
     action, mid_str, idx_str = update.callback_query.data.split("_")
     mid = int(mid_str)
+    # табло другого матча (например, старое сообщение) – заводим контекст заново
+    if ctx.user_data.get("score_mid") != mid or "score_names" not in ctx.user_data:
+        await init_score_ctx(ctx, mid)
     key = f"score_{idx_str}"
     # safely get current value
     val = ctx.user_data.get(key, 0)
@@ -990,124 +1798,244 @@ async def adjust_score(update, ctx):
         val -= 1
     ctx.user_data[key] = val
 
-    # reload players to rebuild keyboard
-    async for s in get_session():
-        m  = await s.get(Match, mid)
-        p1 = await s.get(Player, m.player1_id)
-        p2 = await s.get(Player, m.player2_id)
-
     # attempt to update only the markup; ignore if unchanged
+    name1, name2 = ctx.user_data["score_names"]
+    markup = build_scoreboard_markup(
+        name1, name2,
+        ctx.user_data.get("score_1", 0),
+        ctx.user_data.get("score_2", 0),
+        mid
+    )
+    # правку не ждём под замком пользователя: следующее нажатие
+    # обрабатывается сразу, а ещё не отправленные правки табло send_queue
+    # склеивает в одну – уходит только последний счёт
+    ctx.application.create_task(edit_scoreboard(update.callback_query, markup), update=update)
+
+
+async def edit_scoreboard(query, markup):
     try:
-        await update.callback_query.edit_message_reply_markup(
-            build_scoreboard_markup(
-                p1, p2,
-                ctx.user_data.get("score_1", 0),
-                ctx.user_data.get("score_2", 0),
-                mid
-            )
-        )
+        await query.edit_message_reply_markup(markup)
     except BadRequest as e:
-        if "Message is not modified" in str(e):
-            return
+        if "Message is not modified" not in str(e):
+            raise
+
+
+
+@dataclass
+class MatchOutcome:
+    """Итог подтверждения матча, как его вернула БД."""
+    round_id: int
+    tournament_id: int
+    round_type: str
+    round_done: bool
+    winner_id: int
+    loser_id: int
+    started: list[tuple[int, int, int, int]] = field(default_factory=list)
+
+
+async def apply_match_result(s, m, first_won, score, state=None) -> MatchOutcome | None:
+    """
+    Записывает результат матча одной транзакцией без read-modify-write:
+    UPDATE matches ... RETURNING, затем (для простого раунда) атомарное
+    score = score + n у обоих игроков, (для итогового) создание игр сетки,
+    ставших определёнными, запуск готовых игр за освободившимися столами
+    и закрытие раунда через NOT EXISTS под блокировкой строки раунда.
+    state – закэшированное состояние турнира для сетки и планировщика.
+    Возвращает None, если матч уже был подтверждён (например, двойное нажатие).
+    """
+    winner_id, loser_id = (m.player1_id, m.player2_id) if first_won else (m.player2_id, m.player1_id)
+    new_matches = []
+
+    # раунд блокируется первым (FOR UPDATE): при READ COMMITTED два процесса,
+    # одновременно подтверждающие последние матчи раунда, иначе не видят
+    # результатов друг друга, и раунд навсегда остаётся pending
+    await s.execute(Q_LOCK_MATCH_ROUND, {"mid": m.id})
+    row = (await s.execute(
+        sa_update(Match)
+        .where(Match.id == m.id, Match.status != "done", Round.id == Match.round_id)
+        .values(status="done", result={"winner": winner_id, "loser": loser_id, "score": score})
+        .returning(Round.id, Round.tournament_id, Round.round_type)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if row is None:
+        await s.rollback()
+        return None
+    rid, tid, round_type = row
+    if state is not None and state.tour.id != tid:
+        # состояние чужого турнира: сетка и планировщик не нашли бы раунд
+        logger.warning(f"Match {m.id} belongs to tournament {tid}, not {state.tour.id}; reloading state")
+        state = await tournament_cache.get(tid)
+
+    # award points for simple rounds: winner +2, loser +1
+    if round_type == "simple":
+        await s.execute(
+            sa_update(Player)
+            .where(Player.id.in_([winner_id, loser_id]))
+            .values(score=Player.score + case((Player.id == winner_id, 2), else_=1))
+            .execution_options(synchronize_session=False)
+        )
+
+    # final rounds: schedule bracket games whose both players are now known
+    rnd = state.round(rid) if state is not None else None
+    if round_type == "final" and rnd is not None and "bracket" in rnd.data:
+        slots = state.bracket_slots(rid)
+
+        def result(n):
+            if n == m.table_number:
+                return winner_id, loser_id
+            done = slots.get(n)
+            if done is None or done.status != "done":
+                return None
+            return done.result["winner"], done.result["loser"]
+
+        ready = bracket_ready(compile_bracket(*rnd.data["bracket"]), rnd.data["sides"], result, m.table_number)
+        if ready:
+            new_matches = (await s.execute(
+                insert(Match)
+                .values([
+                    {"round_id": rid, "table_number": n, "player1_id": p1, "player2_id": p2}
+                    for n, p1, p2 in ready
+                ])
+                .returning(Match.id, Match.player1_id, Match.player2_id)
+            )).all()
+
+    # планировщик раунда обновляется событиями, без пересборки; освободившийся
+    # стол сразу занимает лучшая готовая игра. Если транзакция не прошла,
+    # планировщик отбрасывается и потом строится заново по состоянию.
+    sched = schedulers.get(state, rid)
+    started = []
+    try:
+        if sched is not None:
+            sched.finish(m.id)
+            for row in sorted(new_matches):
+                sched.add(*row)
+            started = await dispatch_matches(s, sched)
+
+        # round is done when no unfinished match is left
+        round_done = (await s.execute(
+            sa_update(Round)
+            .where(
+                Round.id == rid,
+                Round.status == "pending",
+                ~exists().where(Match.round_id == rid, Match.status != "done")
+            )
+            .values(status="done")
+            .returning(Round.id)
+            .execution_options(synchronize_session=False)
+        )).first() is not None
+
+        await s.commit()
+    except Exception:
+        schedulers.drop(rid)
         raise
 
+    if round_done:
+        schedulers.drop(rid)
+    return MatchOutcome(rid, tid, round_type, round_done, winner_id, loser_id, started)
 
 
+@idempotent
+@serialized(tournament_of=score_match_tournament)
 async def confirm_score(update, ctx):
+    mid = ctx.user_data.get("score_mid")
+    s1  = ctx.user_data.get("score_1", 0)
+    s2  = ctx.user_data.get("score_2", 0)
+    # prevent tie: табло остаётся как есть, счёт можно поправить и подтвердить снова
+    if mid is not None and s1 == s2:
+        await update.callback_query.answer("Счёт не может быть ничейным", show_alert=True)
+        return NOT_APPLIED
     await update.callback_query.answer()
-    mid = ctx.user_data.pop("score_mid", None)
-    s1  = ctx.user_data.pop("score_1", 0)
-    s2  = ctx.user_data.pop("score_2", 0)
+    for key in ("score_mid", "score_1", "score_2", "score_names"):
+        ctx.user_data.pop(key, None)
     if mid is None:
         return
-    # prevent tie
-    if s1 == s2:
-        return await update.callback_query.answer("Счёт не может быть ничейным", show_alert=True)
 
+    tid = await match_tournament(ctx, mid)
+    state = await tournament_cache.get(tid)
+    m, _, _ = await get_match_players(ctx, mid, tid)
     async for s in get_session():
-        m = await s.get(Match, mid)
-        # determine winner and loser
-        winner_id = m.player1_id if s1 > s2 else m.player2_id
-        loser_id  = m.player2_id if s1 > s2 else m.player1_id
-
-        # save result
-        m.result = {"winner": winner_id, "loser": loser_id, "score": f"{s1}:{s2}"}
-        m.status = "done"
-
-        # award points for simple rounds
-        rnd = await s.get(Round, m.round_id)
-        if rnd.round_type == "simple":
-            pw = await s.get(Player, winner_id)
-            pl = await s.get(Player, loser_id)
-            pw.score += 2
-            pl.score += 1
+        outcome = await apply_match_result(s, m, s1 > s2, f"{s1}:{s2}", state)
+    if outcome is None:
+        # already confirmed by someone else
+        return await send_tournament_menu(update, ctx, tid)
+
+    tournament_cache.invalidate(outcome.tournament_id)
+    await notify_started(update, ctx, outcome.tournament_id, outcome.started)
+    # if a round just finished, send separate summary / final places
+    if outcome.round_done:
+        view = "summary" if outcome.round_type == "simple" else "places"
+        await send_pages(update, ctx, outcome.tournament_id, view, new_message=True)
 
-        await s.commit()
+    # return to tournament menu
+    return await send_tournament_menu(update, ctx, outcome.tournament_id)
 
-        # check if round is fully done
-        allm = (await s.execute(select(Match).where(Match.round_id == rnd.id))).scalars().all()
-        if all(x.status == "done" for x in allm):
-            rnd.status = "done"
-            await s.commit()
-            # if it was a simple round, send separate summary
-            if rnd.round_type == "simple":
-                # load all players and table distribution
-                players = (await s.execute(
-                    select(Player).where(Player.tournament_id == rnd.tournament_id)
-                )).scalars().all()
-                player_map = {p.id: p for p in players}
-                tables = rnd.data["tables"]
-                summary = "📋 Итоги простого раунда:\n"
-                for idx, tbl_ids in enumerate(tables, start=1):
-                    summary += f"\n{idx} Таблица:\n"
-                    tbl_players = [player_map[pid] for pid in tbl_ids]
-                    tbl_sorted = sorted(tbl_players, key=lambda p: p.score, reverse=True)
-                    for place, p in enumerate(tbl_sorted, start=1):
-                        summary += f"{place} место – {p.name} – {p.score} балл{'ов' if p.score % 10 in (2,3,4) else ''}\n"
-                # send the summary as a separate message
-                await ctx.bot.send_message(
-                    chat_id=update.effective_chat.id,
-                    text=summary,
-                    parse_mode="HTML"
-                )
+def summary_lines(state) -> list[str]:
+    """Итоги последнего завершённого простого раунда: места внутри таблиц."""
+    simple = next(
+        (r for r in reversed(state.rounds) if r.round_type == "simple" and r.status == "done"),
+        None
+    )
+    lines = ["📋 Итоги простого раунда:"]
+    if not simple:
+        return lines
+    for idx, tbl_ids in enumerate(simple.data["tables"], start=1):
+        lines.append("")
+        lines.append(f"{idx} Таблица:")
+        tbl_players = [state.players[pid] for pid in tbl_ids]
+        tbl_sorted = sorted(tbl_players, key=lambda p: p.score, reverse=True)
+        for place, p in enumerate(tbl_sorted, start=1):
+            lines.append(f"{place} место – {p.name} – {p.score} {points_word(p.score)}")
+    return lines
+
+
+def places_lines(state) -> list[str]:
+    """Места по итогам последнего завершённого итогового раунда (по сетке)."""
+    final = next(
+        (r for r in reversed(state.rounds)
+         if r.round_type == "final" and r.status == "done" and "bracket" in r.data),
+        None
+    )
+    lines = ["🏆 Итоговые места:"]
+    if not final:
+        return lines
+    slots = state.bracket_slots(final.id)
+
+    def result(n):
+        m = slots.get(n)
+        if m is None or m.status != "done":
+            return None
+        return m.result["winner"], m.result["loser"]
+
+    places = bracket_places(compile_bracket(*final.data["bracket"]), final.data["sides"], result)
+    for place, pid in enumerate(places, start=1):
+        name = state.players[pid].name if pid in state.players else "—"
+        lines.append(f"{place} место – {name}")
+    return lines
 
-    # return to tournament menu
-    return await send_tournament_menu(update, ctx, ctx.user_data["tid"])
 
 async def noop_callback(update, ctx):
     await update.callback_query.answer()
 
+@idempotent
+@serialized(tournament_of=callback_match_tournament)
 async def confirm_res(update, ctx):
     await update.callback_query.answer()
     _, mid, who, score = update.callback_query.data.split("_", 3)
     mid, who = int(mid), int(who)
 
+    tid = await match_tournament(ctx, mid)
+    state = await tournament_cache.get(tid)
+    m, _, _ = await get_match_players(ctx, mid, tid)
     async for s in get_session():
-        m = await s.get(Match, mid)
-        if m.status != "playing":
-            return await send_tournament_menu(update, ctx, ctx.user_data["tid"])
-
-        winner_id = m.player1_id if who== "1" else m.player2_id
-        loser_id  = m.player2_id if who== "1" else m.player1_id
-
-        m.result = {"winner": winner_id, "loser": loser_id, "score": score}
-        m.status = "done"
+        outcome = await apply_match_result(s, m, who == 1, score, state)
+    if outcome is None:
+        return await send_tournament_menu(update, ctx, tid)
+    tournament_cache.invalidate(outcome.tournament_id)
+    await notify_started(update, ctx, outcome.tournament_id, outcome.started)
+    if outcome.round_done and outcome.round_type == "final":
+        await send_pages(update, ctx, outcome.tournament_id, "places", new_message=True)
 
-        rnd = await s.get(Round, m.round_id)
-        if rnd.round_type == "simple":
-            pw = await s.get(Player, winner_id)
-            pl = await s.get(Player, loser_id)
-            pw.score += 2
-            pl.score += 1
-
-        await s.commit()
-
-        allm = (await s.execute(select(Match).where(Match.round_id==rnd.id))).scalars().all()
-        if all(x.status=="done" for x in allm):
-            rnd.status = "done"
-            await s.commit()
-
-    return await send_tournament_menu(update, ctx, ctx.user_data["tid"])
+    return await send_tournament_menu(update, ctx, outcome.tournament_id)
 
 
 
@@ -1122,15 +2050,9 @@ async def settings_cb(update, ctx):
     await update.callback_query.answer()
     async for s in get_session():
         adm = await s.get(Administrator, ctx.user_data["admin_id"])
-    kb = []
-    if ctx.user_data.get("role") == "main":
-        kb.append([InlineKeyboardButton("➕ Рег. код", callback_data="gen_code")])
-        kb.append([InlineKeyboardButton("👥 Список админов", callback_data="list_admins")])
-    kb.append([InlineKeyboardButton("✏️ Сменить логин", callback_data="change_login")])
-    kb.append([InlineKeyboardButton("🔒 Сменить пароль", callback_data="change_pass")])
-    kb.append([back_btn("home"), InlineKeyboardButton("🚪 Выйти", callback_data="logout")])
+    markup = SETTINGS_MAIN_MARKUP if ctx.user_data.get("role") == "main" else SETTINGS_MARKUP
     text = f"⚙️ Настройки\nТекущий логин: <b>{adm.username}</b>"
-    await update.callback_query.edit_message_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(kb))
+    await update.callback_query.edit_message_text(text, parse_mode="HTML", reply_markup=markup)
 
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
@@ -1149,6 +2071,7 @@ async def logout(update, ctx):
                 await session.commit()
     except Exception as e:
         logger.error(f"Logout DB error: {e}")
+    login_cache.put(update.effective_user.id, None)
     ctx.user_data.clear()
 
     kb = [[InlineKeyboardButton("🔑 Войти", callback_data="auth_start")]]
@@ -1162,6 +2085,28 @@ async def logout(update, ctx):
     return ConversationHandler.END
 
 
+async def stats_cmd(update, ctx):
+    if await require_login(update, ctx):
+        return
+    if ctx.user_data.get("role") != "main":
+        return await update.message.reply_text("Доступно только главному админу.")
+    cache = tournament_cache.stats()
+    sq = send_queue.stats()
+    txt = (
+        "📊 <b>Статистика</b>\n"
+        f"🗂 Кэш турниров: {cache['size']} шт., "
+        f"попаданий {cache['hits']}, промахов {cache['misses']} "
+        f"({cache['hit_rate']:.0%})\n"
+        f"👆 Повторных нажатий отброшено: {callback_dedup.duplicates}\n"
+        f"📤 Отправка: в очереди {sq['depth']} (макс. {sq['max_depth']}), "
+        f"отправлено {sq['sent']}, склеено правок {sq['coalesced']}, "
+        f"задержано {sq['throttled']} (в среднем {sq['delay_avg']:.2f} с), "
+        f"повторов после 429: {sq['retries']}\n"
+        f"🗄 БД: {format_pool_stats(pool_stats.snapshot())}"
+    )
+    await update.message.reply_text(txt, parse_mode="HTML")
+
+
 async def gen_code(update, ctx):
     if await require_login(update, ctx):
         return
@@ -1172,7 +2117,7 @@ async def gen_code(update, ctx):
     async for s in get_session():
         s.add(RegCode(code=code, role="admin"))
         await s.commit()
-    await update.callback_query.edit_message_text(f"🗝 Код: <code>{code}</code>", parse_mode="HTML", reply_markup=InlineKeyboardMarkup([[back_btn("settings")]]))
+    await update.callback_query.edit_message_text(f"🗝 Код: <code>{code}</code>", parse_mode="HTML", reply_markup=back_markup("settings"))
 
 
 async def list_admins(update, ctx):
@@ -1182,7 +2127,7 @@ async def list_admins(update, ctx):
     async for s in get_session():
         lst = (await s.execute(select(Administrator))).scalars().all()
     txt = "\n".join(f"{a.username} ({a.role})" for a in lst)
-    await update.callback_query.edit_message_text("👥 Администраторы:\n" + txt, reply_markup=InlineKeyboardMarkup([[back_btn("settings")]]))
+    await update.callback_query.edit_message_text("👥 Администраторы:\n" + txt, reply_markup=back_markup("settings"))
 
 
 # ---------- REG FLOW ----------
@@ -1200,7 +2145,7 @@ async def reg_start(update, ctx):
         ctx.user_data["reg_role"] = rc.role
         await s.delete(rc)
         await s.commit()
-    await update.message.reply_text("🔑 Введите логин нового админа:", reply_markup=InlineKeyboardMarkup([[back_btn()]]))
+    await update.message.reply_text("🔑 Введите логин нового админа:", reply_markup=back_markup())
     return REG_NAME
 
 
@@ -1209,7 +2154,7 @@ async def reg_name(update, ctx):
     if txt.lower() == "назад":
         return await show_home(update, ctx)
     ctx.user_data["reg_login"] = txt
-    await update.message.reply_text("💻 Введите пароль нового админа:", reply_markup=InlineKeyboardMarkup([[back_btn()]]))
+    await update.message.reply_text("💻 Введите пароль нового админа:", reply_markup=back_markup())
     return REG_PASS
 
 
@@ -1217,7 +2162,7 @@ async def reg_pass(update, ctx):
     pwd = update.message.text.strip()
     if pwd.lower() == "назад":
         return await show_home(update, ctx)
-    hashed = bcrypt.hash(pwd)
+    hashed = await hash_password(pwd)
     async for s in get_session():
         s.add(Administrator(username=ctx.user_data["reg_login"], password=hashed, role=ctx.user_data["reg_role"]))
         await s.commit()
@@ -1230,7 +2175,7 @@ async def change_login_start(update, ctx):
     if await require_login(update, ctx):
         return
     await update.callback_query.answer()
-    await update.callback_query.edit_message_text("✏️ Введите новый логин:", reply_markup=InlineKeyboardMarkup([[back_btn("settings")]]))
+    await update.callback_query.edit_message_text("✏️ Введите новый логин:", reply_markup=back_markup("settings"))
     return CHL_NEW
 
 
@@ -1239,11 +2184,10 @@ async def change_login_new(update, ctx):
     if new.lower() == "назад":
         return await settings_cb(update, ctx)
     async for s in get_session():
-        if (await s.execute(select(Administrator).where(Administrator.username == new))).scalar_one_or_none():
-            return await update.message.reply_text("❌ Логин занят.", reply_markup=InlineKeyboardMarkup([[back_btn()]]))
+        if (await s.execute(Q_ADMIN_BY_LOGIN, {"login": new})).scalar_one_or_none():
+            return await update.message.reply_text("❌ Логин занят.", reply_markup=back_markup())
     ctx.user_data["new_login"] = new
-    kb = [[InlineKeyboardButton("✅ Подтвердить", callback_data="confirm_login")], [back_btn("settings")]]
-    await update.message.reply_text(f"Подтвердить новый логин <b>{new}</b>?", parse_mode="HTML", reply_markup=InlineKeyboardMarkup(kb))
+    await update.message.reply_text(f"Подтвердить новый логин <b>{new}</b>?", parse_mode="HTML", reply_markup=CONFIRM_LOGIN_MARKUP)
     return ConversationHandler.END
 
 
@@ -1253,6 +2197,7 @@ async def confirm_login(update, ctx):
     async for s in get_session():
         await s.execute(sa_update(Administrator).where(Administrator.id == ctx.user_data["admin_id"]).values(username=new))
         await s.commit()
+    login_cache.invalidate(admin_id=ctx.user_data["admin_id"])
     await update.callback_query.edit_message_text("✅ Логин изменён.")
     return await settings_cb(update, ctx)
 
@@ -1262,10 +2207,12 @@ async def change_pass_start(update, ctx):
     if await require_login(update, ctx):
         return
     await update.callback_query.answer()
-    await update.callback_query.edit_message_text("🔒 Введите старый пароль:", reply_markup=InlineKeyboardMarkup([[back_btn("settings")]]))
+    await update.callback_query.edit_message_text("🔒 Введите старый пароль:", reply_markup=back_markup("settings"))
     return CHP_OLD
 
 
+@idempotent
+@serialized()
 async def end_tournament(update, ctx):
     await update.callback_query.answer("🏁 Турнир завершён")
     tid = ctx.user_data.get("tid")
@@ -1276,6 +2223,7 @@ async def end_tournament(update, ctx):
             .values(status="ended", finished_at=func.now())
         )
         await s.commit()
+    tournament_cache.invalidate(tid)
     # show final summary or go to home
     return await show_home(update, ctx)
 
@@ -1285,13 +2233,13 @@ async def change_pass_old(update, ctx):
         return await settings_cb(update, ctx)
     async for s in get_session():
         adm = await s.get(Administrator, ctx.user_data["admin_id"])
-        try:
-            valid = bcrypt.verify(old, adm.password)
-        except ValueError:
-            valid = old == adm.password
+        valid, new_hash = await verify_password(old, adm.password)
         if not valid:
-            return await update.message.reply_text("❌ Неверный пароль.", reply_markup=InlineKeyboardMarkup([[back_btn()]]))
-    await update.message.reply_text("🔒 Введите новый пароль:", reply_markup=InlineKeyboardMarkup([[back_btn("settings")]]))
+            return await update.message.reply_text("❌ Неверный пароль.", reply_markup=back_markup())
+        if new_hash:
+            adm.password = new_hash
+            await s.commit()
+    await update.message.reply_text("🔒 Введите новый пароль:", reply_markup=back_markup("settings"))
     return CHP_NEW
 
 
@@ -1300,14 +2248,13 @@ async def change_pass_new(update, ctx):
     if new.lower() == "назад":
         return await settings_cb(update, ctx)
     ctx.user_data["new_pass"] = new
-    kb = [[InlineKeyboardButton("✅ Подтвердить", callback_data="confirm_pass")], [back_btn("settings")]]
-    await update.message.reply_text("Подтвердить новый пароль?", reply_markup=InlineKeyboardMarkup(kb))
+    await update.message.reply_text("Подтвердить новый пароль?", reply_markup=CONFIRM_PASS_MARKUP)
     return ConversationHandler.END
 
 
 async def confirm_pass(update, ctx):
     await update.callback_query.answer()
-    hashed = bcrypt.hash(ctx.user_data["new_pass"])
+    hashed = await hash_password(ctx.user_data["new_pass"])
     async for s in get_session():
         await s.execute(sa_update(Administrator).where(Administrator.id == ctx.user_data["admin_id"]).values(password=hashed))
         await s.commit()
@@ -1315,22 +2262,361 @@ async def confirm_pass(update, ctx):
     return await settings_cb(update, ctx)
 
 
+# ---------- OUTGOING RATE LIMIT ----------
+class TokenBucket:
+    """rate токенов в секунду, в запасе не больше burst. Токены резервируются заранее."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Забирает токен; возвращает, сколько секунд ждать до отправки."""
+        self._refill()
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def pause(self, seconds):
+        """После 429 ничего не отправлять ещё seconds секунд."""
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class SendQueue(BaseRateLimiter):
+    """
+    Очередь исходящих запросов к Bot API. Запросы в чат ждут токенов из
+    общего бакета и бакета чата (в группах лимит поминутный). Правки одного
+    сообщения, ещё ждущие своей очереди, склеиваются: уходит только последняя,
+    а все вызвавшие получают её результат. На 429 RetryAfter запрос
+    повторяется после указанной паузы.
+    """
+    COALESCED = frozenset({"editMessageText", "editMessageReplyMarkup"})
+
+    def __init__(self, global_rate=30, chat_rate=1, group_per_min=20, burst=3,
+                 max_retries=3, max_chats=10000):
+        self.chat_rate = chat_rate
+        self.group_rate = group_per_min / 60
+        self.burst = burst
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self._global = TokenBucket(global_rate, max(1, int(global_rate)))
+        self._chats: OrderedDict[object, TokenBucket] = OrderedDict()
+        self._edits: dict[tuple, dict] = {}
+        self.depth = 0
+        self.max_depth = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.throttled = 0
+        self.delay_total = 0.0
+        self.retries = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            group = isinstance(chat_id, int) and chat_id < 0
+            bucket = TokenBucket(self.group_rate if group else self.chat_rate, self.burst)
+            self._chats[chat_id] = bucket
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+    async def _send(self, bucket, callback, args, kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                logger.warning(f"Flood limit hit, retrying in {e.retry_after}s")
+                (bucket or self._global).pause(e.retry_after)
+                await asyncio.sleep(e.retry_after)
+            else:
+                self.sent += 1
+                return result
+
+    async def _throttle(self, delay):
+        if delay <= 0:
+            return
+        self.throttled += 1
+        self.delay_total += delay
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self.depth -= 1
+
+    async def _deliver(self, key, entry, bucket, delay):
+        """Отправляет последнюю из склеенных правок и раздаёт результат ждущим."""
+        result = entry["result"]
+        try:
+            await self._throttle(delay)
+            del self._edits[key]
+            callback, args, kwargs = entry["call"]
+            result.set_result(await self._send(bucket, callback, args, kwargs))
+        except asyncio.CancelledError:
+            result.cancel()
+            raise
+        except Exception as exc:
+            result.set_exception(exc)
+            result.exception()  # ждущих может уже не быть
+        finally:
+            if self._edits.get(key) is entry:
+                del self._edits[key]
+
+    async def _wait(self, entry):
+        entry["waiters"] += 1
+        try:
+            return await asyncio.shield(entry["result"])
+        except asyncio.CancelledError:
+            # отмена одного вызвавшего не отменяет правку остальных: её
+            # отправка идёт отдельной задачей и снимается, только когда
+            # ждать результата больше некому
+            entry["waiters"] -= 1
+            if not entry["waiters"] and not entry["result"].done():
+                entry["task"].cancel()
+            raise
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id")
+        if chat_id is None:
+            # answerCallbackQuery, getUpdates и т.п. не упираются в лимиты чатов
+            return await self._send(None, callback, args, kwargs)
+
+        bucket = self._chat_bucket(chat_id)
+        if endpoint in self.COALESCED and data.get("message_id"):
+            key = (chat_id, data["message_id"], endpoint)
+            entry = self._edits.get(key)
+            if entry is not None:
+                entry["call"] = (callback, args, kwargs)
+                self.coalesced += 1
+            else:
+                entry = {"call": (callback, args, kwargs), "waiters": 0,
+                         "result": asyncio.get_running_loop().create_future()}
+                self._edits[key] = entry
+                delay = max(self._global.reserve(), bucket.reserve())
+                entry["task"] = asyncio.create_task(self._deliver(key, entry, bucket, delay))
+            return await self._wait(entry)
+
+        await self._throttle(max(self._global.reserve(), bucket.reserve()))
+        return await self._send(bucket, callback, args, kwargs)
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "throttled": self.throttled,
+            "delay_avg": self.delay_total / self.throttled if self.throttled else 0.0,
+            "retries": self.retries,
+        }
+
+
+send_queue = SendQueue(
+    SEND_GLOBAL_RATE, SEND_CHAT_RATE, SEND_GROUP_PER_MIN, SEND_CHAT_BURST, SEND_MAX_RETRIES
+)
+
+
+# ---------- PERSISTENCE ----------
+class PostgresPersistence(BasePersistence):
+    """
+    Хранит user_data и состояния диалогов в таблице bot_state.
+    user_data пользователя подгружается лениво – при его первом апдейте после
+    старта; изменения копятся в памяти и пишутся одним upsert'ом через
+    flush_delay секунд, а не на каждое нажатие.
+    """
+    # секреты в промежуточных шагах диалогов в БД не пишем
+    VOLATILE_KEYS = {"login_try", "new_pass"}
+
+    def __init__(self, update_interval=5, flush_delay=1.0, retry_delay=5.0):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.flush_delay = flush_delay
+        self.retry_delay = retry_delay
+        self._loaded_users: set[int] = set()
+        # user_id -> идущая загрузка user_data; параллельные апдейты ждут её
+        self._loading: dict[int, asyncio.Task] = {}
+        # (kind, key) -> data; None означает удалить строку
+        self._dirty: dict[tuple[str, str], object] = {}
+        self._flush_task: asyncio.Task | None = None
+        # задача, которая сейчас пишет пачку (уже вынутую из _dirty)
+        self._writing: asyncio.Task | None = None
+
+    def _mark(self, kind, key, data):
+        self._dirty[(kind, key)] = data
+        self._schedule(self.flush_delay)
+
+    def _schedule(self, delay):
+        task = self._flush_task
+        if task is None or task.done() or task is asyncio.current_task():
+            self._flush_task = asyncio.create_task(self._flush_later(delay))
+
+    async def _flush_later(self, delay):
+        await asyncio.sleep(delay)
+        self._writing = me = asyncio.current_task()
+        try:
+            await self._write()
+        finally:
+            if self._writing is me:
+                self._writing = None
+
+    async def _write(self, retry=True):
+        if not self._dirty:
+            return
+        batch, self._dirty = self._dirty, {}
+        upserts = [{"kind": k, "key": key, "data": data} for (k, key), data in batch.items() if data is not None]
+        deletes = [pk for pk, data in batch.items() if data is None]
+        try:
+            async for s in get_session():
+                if upserts:
+                    stmt = pg_insert(BotState).values(upserts)
+                    await s.execute(stmt.on_conflict_do_update(
+                        index_elements=[BotState.kind, BotState.key],
+                        set_={"data": stmt.excluded.data, "updated_at": func.now()}
+                    ))
+                if deletes:
+                    await s.execute(delete(BotState).where(tuple_(BotState.kind, BotState.key).in_(deletes)))
+                await s.commit()
+        except Exception as e:
+            logger.error(f"Persistence flush error: {e}")
+            # вернуть в очередь всё, что не успели перезаписать более новым
+            for pk, data in batch.items():
+                self._dirty.setdefault(pk, data)
+            if retry:
+                self._schedule(self.retry_delay)
+            return
+        # изменения, пришедшие во время записи, _mark не запланировал
+        if retry and self._dirty:
+            self._schedule(self.flush_delay)
+
+    async def get_user_data(self):
+        return {}
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        async for s in get_session():
+            rows = (await s.execute(
+                select(BotState.key, BotState.data).where(BotState.kind == f"conv:{name}")
+            )).all()
+        return {tuple(json.loads(key)): state for key, state in rows}
+
+    async def update_conversation(self, name, key, new_state):
+        self._mark(f"conv:{name}", json.dumps(list(key)), new_state)
+
+    async def update_user_data(self, user_id, data):
+        self._mark("user", str(user_id), {k: v for k, v in data.items() if k not in self.VOLATILE_KEYS})
+
+    async def _load_user(self, user_id):
+        try:
+            async for s in get_session():
+                stored = (await s.execute(
+                    select(BotState.data).where(BotState.kind == "user", BotState.key == str(user_id))
+                )).scalar_one_or_none()
+            self._loaded_users.add(user_id)
+            return stored
+        finally:
+            del self._loading[user_id]
+
+    async def refresh_user_data(self, user_id, user_data):
+        if user_id in self._loaded_users:
+            return
+        # пользователь считается загруженным только после SELECT: второй
+        # апдейт того же пользователя ждёт ту же загрузку, а не видит пустой user_data
+        load = self._loading.get(user_id)
+        if load is None:
+            load = self._loading[user_id] = asyncio.create_task(self._load_user(user_id))
+        stored = await asyncio.shield(load)
+        for k, v in (stored or {}).items():
+            user_data.setdefault(k, v)
+
+    async def drop_user_data(self, user_id):
+        self._mark("user", str(user_id), None)
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def flush(self):
+        # идущую запись не отменяем – её пачки уже нет в _dirty, и отмена
+        # потеряла бы её; снимаем только задачу, которая ещё ждёт своей очереди
+        while self._writing is not None and not self._writing.done():
+            await asyncio.wait({self._writing})
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self._write(retry=False)
+
+
 # ---------- MAIN ----------
 def main():
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     loop.run_until_complete(init_db())
 
-    app = ApplicationBuilder().token(TOKEN).build()
+    app = (
+        ApplicationBuilder()
+        .application_class(SerializedApplication)
+        .token(TOKEN)
+        .base_url(TELEGRAM_API_URL)
+        .persistence(PostgresPersistence(PERSISTENCE_INTERVAL, PERSISTENCE_FLUSH_DELAY))
+        .concurrent_updates(CONCURRENT_UPDATES)
+        .rate_limiter(send_queue)
+        .build()
+    )
 
     app.add_handler(MessageHandler(filters.FORWARDED, drop_forward), group=0)
 
     async def drop_wh(app):
-        await app.bot.delete_webhook(drop_pending_updates=True)
+        if BOT_MODE != "webhook":
+            await app.bot.delete_webhook(drop_pending_updates=True)
+        await warm_login_cache()
+        if DB_POOL_LOG_INTERVAL > 0:
+            app.bot_data["pool_log_task"] = asyncio.create_task(log_pool_stats())
 
     app.post_init = drop_wh
 
     auth_conv = ConversationHandler(
+        name="auth", persistent=True,
         entry_points=[
             CommandHandler("start", start),
             CallbackQueryHandler(auth_start, pattern="^auth_start$")
@@ -1353,6 +2639,7 @@ def main():
     app.add_handler(auth_conv)
 
     ct_conv = ConversationHandler(
+        name="ct", persistent=True,
         entry_points=[
             CallbackQueryHandler(ct_start, pattern="^ct_start$")
         ],
@@ -1399,17 +2686,20 @@ def main():
     app.add_handler(CallbackQueryHandler(adjust_score,   pattern=r"^(?:inc|dec)_\d+_[12]$"))
     app.add_handler(CallbackQueryHandler(confirm_score,  pattern=r"^confirm_\d+$"))
     app.add_handler(CallbackQueryHandler(noop_callback,  pattern="^noop$"))
+    app.add_handler(CallbackQueryHandler(page_cb,        pattern=r"^page_(?:hist|tables|summary|places)_\d+_\d+$"))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_match_score), group=1)
     app.add_handler(CallbackQueryHandler(confirm_res,     pattern=r"^confirm_\d+_[12]_.+$"))
     app.add_handler(CallbackQueryHandler(end_tournament,  pattern="^end_tournament$"))
     app.add_handler(CallbackQueryHandler(finish_round,    pattern="^finish_round$"))
 
     app.add_handler(CallbackQueryHandler(settings_cb, pattern="^settings$"))
+    app.add_handler(CommandHandler("stats", stats_cmd))
     app.add_handler(CallbackQueryHandler(gen_code, pattern="^gen_code$"))
     app.add_handler(CallbackQueryHandler(list_admins, pattern="^list_admins$"))
     app.add_handler(CallbackQueryHandler(logout, pattern="^logout$"))
 
     reg_conv = ConversationHandler(
+        name="reg", persistent=True,
         entry_points=[CommandHandler("reg", reg_start)],
         states={
             REG_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, reg_name)],
@@ -1420,6 +2710,7 @@ def main():
     app.add_handler(reg_conv)
 
     chlogin_conv = ConversationHandler(
+        name="chlogin", persistent=True,
         entry_points=[CallbackQueryHandler(change_login_start, pattern="^change_login$")],
         states={CHL_NEW: [MessageHandler(filters.TEXT & ~filters.COMMAND, change_login_new)]},
         fallbacks=[CommandHandler("cancel", start)]
@@ -1428,6 +2719,7 @@ def main():
     app.add_handler(CallbackQueryHandler(confirm_login, pattern="^confirm_login$"))
 
     chpass_conv = ConversationHandler(
+        name="chpass", persistent=True,
         entry_points=[CallbackQueryHandler(change_pass_start, pattern="^change_pass$")],
         states={
             CHP_OLD: [MessageHandler(filters.TEXT & ~filters.COMMAND, change_pass_old)],
@@ -1438,8 +2730,23 @@ def main():
     app.add_handler(chpass_conv)
     app.add_handler(CallbackQueryHandler(confirm_pass, pattern="^confirm_pass$"))
 
-    logger.info("🚀 Bot started")
-    app.run_polling()
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL or not WEBHOOK_SECRET:
+            raise SystemExit("❌ BOT_MODE=webhook requires WEBHOOK_URL and WEBHOOK_SECRET")
+        logger.info(f"🚀 Bot started (webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH})")
+        # встроенный HTTP-сервер работает в том же event loop, что и бот;
+        # запросы без заголовка X-Telegram-Bot-Api-Secret-Token отклоняются
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            drop_pending_updates=True,
+        )
+    else:
+        logger.info("🚀 Bot started")
+        app.run_polling()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+"""
+Бенчмарк записи простого раунда на 64 игрока: ORM против INSERT ... VALUES.
+
+Запуск (в контейнере бота, с теми же DB_* переменными окружения):
+    python bench_bulk_insert.py [повторов]
+
+Нужна рабочая база со схемой из migrations/. Всё выполняется в одной
+транзакции: каждый прогон – внутри SAVEPOINT, который откатывается, а в
+конце откатывается и сама транзакция, так что в базе ничего не остаётся.
+Сравниваются регистрация 64 игроков (ct_players) и матчи раунда
+(round_simple): по одному ORM-объекту на строку против одного
+insert().values([...]).
+"""
+import asyncio
+import sys
+import time
+from itertools import combinations
+
+from sqlalchemy import insert
+
+import app
+from app import Match, Player, Round, Tournament
+from seeding import seating
+
+PLAYERS = 64
+
+
+async def timed(s, write, runs):
+    best = float("inf")
+    for _ in range(runs):
+        sp = await s.begin_nested()
+        t0 = time.perf_counter()
+        await write()
+        await s.flush()
+        best = min(best, time.perf_counter() - t0)
+        await sp.rollback()
+    return best
+
+
+async def run(runs):
+    async with app.AsyncSessionLocal() as s:
+        tour = Tournament(name="bench", tournament_type="Beginner", data={})
+        s.add(tour)
+        await s.flush()
+        names = [f"Игрок {i}" for i in range(1, PLAYERS + 1)]
+
+        async def players_orm():
+            for nm in names:
+                s.add(Player(tournament_id=tour.id, name=nm))
+
+        async def players_bulk():
+            await s.execute(insert(Player).values([
+                {"tournament_id": tour.id, "name": nm} for nm in names
+            ]))
+
+        ids = (await s.execute(
+            insert(Player)
+            .values([{"tournament_id": tour.id, "name": nm} for nm in names])
+            .returning(Player.id)
+        )).scalars().all()
+        tables = [[ids[r] for r in tbl] for tbl in seating(len(ids))]
+        rnd = Round(tournament_id=tour.id, round_type="simple", data={"tables": tables})
+        s.add(rnd)
+        await s.flush()
+        rows = [
+            {"round_id": rnd.id, "table_number": idx, "player1_id": a, "player2_id": b}
+            for idx, tbl in enumerate(tables, start=1)
+            for a, b in combinations(tbl, 2)
+        ]
+
+        async def matches_orm():
+            for row in rows:
+                s.add(Match(**row))
+
+        async def matches_bulk():
+            await s.execute(insert(Match).values(rows))
+
+        print(f"{PLAYERS} игроков, {len(tables)} таблиц, {len(rows)} матчей")
+        for name, write in [
+            ("players, ORM add", players_orm),
+            ("players, insert().values", players_bulk),
+            ("matches, ORM add", matches_orm),
+            ("matches, insert().values", matches_bulk),
+        ]:
+            best = await timed(s, write, runs)
+            print(f"{name:26} {best * 1e3:8.2f} ms")
+        await s.rollback()
+    await app.engine.dispose()
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    asyncio.run(run(runs))
+
+
+if __name__ == "__main__":
+    main()
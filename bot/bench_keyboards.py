@@ -0,0 +1,48 @@
+"""
+Микробенчмарк клавиатур на горячем пути ➕/➖ табло счёта.
+
+Запуск (в контейнере бота, где установлены зависимости):
+    python bench_keyboards.py [повторов]
+
+Сравнивает сборку табло без кэша (build_scoreboard_markup.__wrapped__) и
+с кэшем, а также сериализацию разметки в JSON, как при отправке в Bot API.
+"""
+import json
+import sys
+import timeit
+
+import app
+
+MATCHES = 64
+STATES = [(s1, s2) for s1 in range(4) for s2 in range(4)]
+
+
+def taps(build):
+    for mid in range(MATCHES):
+        for s1, s2 in STATES:
+            build("Иванов", "Петров", s1, s2, mid)
+
+
+def serialize():
+    for mid in range(MATCHES):
+        for s1, s2 in STATES:
+            markup = app.build_scoreboard_markup("Иванов", "Петров", s1, s2, mid)
+            json.dumps(markup.to_dict(), ensure_ascii=False)
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    per_call = number * MATCHES * len(STATES)
+    taps(app.build_scoreboard_markup)  # прогрев кэша
+    for name, fn in [
+        ("build, no cache", lambda: taps(app.build_scoreboard_markup.__wrapped__)),
+        ("build, lru cache", lambda: taps(app.build_scoreboard_markup)),
+        ("cached + to_dict/json", serialize),
+    ]:
+        best = min(timeit.repeat(fn, number=number, repeat=5))
+        print(f"{name:24} {best / per_call * 1e6:8.2f} µs/tap")
+    print(app.build_scoreboard_markup.cache_info())
+
+
+if __name__ == "__main__":
+    main()
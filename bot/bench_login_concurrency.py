@@ -0,0 +1,73 @@
+"""
+Отзывчивость табло счёта во время одновременных входов.
+
+Запуск (в контейнере бота, где установлены зависимости):
+    python bench_login_concurrency.py [входов]
+
+База не нужна. Пока идут N одновременных проверок пароля bcrypt, отдельная
+задача каждые TAP_INTERVAL секунд «нажимает» ➕ на табло (сборка
+build_scoreboard_markup) и меряет, насколько позже запланированного она
+получила управление. Два режима: pwd_context.verify прямо в обработчике
+(блокирует event loop) и verify_password через password_executor.
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+import app
+
+TAP_INTERVAL = 0.02
+
+
+async def tapper(stop, delays):
+    s1 = 0
+    while not stop.is_set():
+        due = time.perf_counter() + TAP_INTERVAL
+        await asyncio.sleep(TAP_INTERVAL)
+        app.build_scoreboard_markup.__wrapped__("Иванов", "Петров", s1 % 4, 0, 1)
+        delays.append(time.perf_counter() - due)
+        s1 += 1
+
+
+async def login_inline(pwd, hashed):
+    return app.pwd_context.verify(pwd, hashed)
+
+
+async def login_executor(pwd, hashed):
+    return (await app.verify_password(pwd, hashed))[0]
+
+
+async def run(login, logins, hashed):
+    stop, delays = asyncio.Event(), []
+    tap = asyncio.create_task(tapper(stop, delays))
+    await asyncio.sleep(TAP_INTERVAL * 3)
+    t0 = time.perf_counter()
+    ok = await asyncio.gather(*(login("secret", hashed) for _ in range(logins)))
+    total = time.perf_counter() - t0
+    stop.set()
+    await tap
+    assert all(ok)
+    delays.sort()
+    p95 = delays[int(len(delays) * 0.95) - 1] if len(delays) > 1 else delays[-1]
+    return total, statistics.median(delays), p95, delays[-1], len(delays)
+
+
+async def main_async(logins):
+    hashed = await app.hash_password("secret")
+    print(f"{logins} входов, bcrypt rounds={app.BCRYPT_ROUNDS}, workers={app.BCRYPT_WORKERS}")
+    for name, login in [("verify in handler", login_inline), ("verify_password", login_executor)]:
+        total, med, p95, worst, taps = await run(login, logins, hashed)
+        print(
+            f"{name:18} входы {total * 1e3:7.0f} ms | нажатий {taps:3} | задержка "
+            f"медиана {med * 1e3:6.1f} p95 {p95 * 1e3:6.1f} max {worst * 1e3:6.1f} ms"
+        )
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    asyncio.run(main_async(logins))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Микробенчмарк заранее собранных запросов (Q_*) против select() в обработчике.
+
+Запуск (в контейнере бота, где установлены зависимости):
+    python bench_queries.py [повторов]
+
+База не нужна: меряется только CPU на стороне SQLAlchemy за один вызов –
+сборка дерева select(), вычисление ключа кэша компиляции (это делается при
+каждом execute) и, для сравнения, полная компиляция под диалект asyncpg,
+которую платит промах query_cache.
+"""
+import sys
+import timeit
+
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+import app
+from app import Administrator, Match, Player, Round, Tournament
+
+
+def inline_admin():
+    return select(Administrator).where(Administrator.telegram_id == 123456789)
+
+
+def inline_rounds():
+    return (
+        select(Round, Match)
+        .outerjoin(Match, Match.round_id == Round.id)
+        .where(Round.tournament_id == 42)
+        .order_by(Round.created_at, Round.id, Match.id)
+    )
+
+
+def inline_history():
+    p1, p2 = aliased(Player), aliased(Player)
+    return (
+        select(Round, Match, p1.name, p2.name)
+        .join(Match, Match.round_id == Round.id)
+        .outerjoin(p1, p1.id == Match.player1_id)
+        .outerjoin(p2, p2.id == Match.player2_id)
+        .where(Round.tournament_id == 42)
+        .order_by(Round.created_at, Round.id, Match.table_number, Match.id)
+    )
+
+
+def inline_players():
+    return (
+        select(Player)
+        .where(Player.tournament_id == 42)
+        .order_by(Player.score.desc(), Player.id)
+    )
+
+
+def inline_active():
+    return select(Tournament).where(Tournament.status != "ended")
+
+
+QUERIES = [
+    ("admin by tg", inline_admin, app.Q_ADMIN_BY_TG),
+    ("rounds+matches", inline_rounds, app.Q_ROUNDS_WITH_MATCHES),
+    ("history", inline_history, app.Q_HISTORY),
+    ("players by score", inline_players, app.Q_PLAYERS_BY_SCORE),
+    ("active tournaments", inline_active, app.Q_ACTIVE_TOURNAMENTS),
+]
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    dialect = app.engine.dialect
+    for name, build, prebuilt in QUERIES:
+        print(name)
+        for label, fn in [
+            ("inline build + cache key", lambda: build()._generate_cache_key()),
+            ("prebuilt cache key", lambda: prebuilt._generate_cache_key()),
+            ("compile (cache miss)", lambda: prebuilt.compile(dialect=dialect)),
+        ]:
+            best = min(timeit.repeat(fn, number=number, repeat=5))
+            print(f"  {label:26} {best / number * 1e6:8.2f} µs/call")
+
+
+if __name__ == "__main__":
+    main()
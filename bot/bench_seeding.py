@@ -0,0 +1,36 @@
+"""
+Микробенчмарк рассадки простого раунда.
+
+Запуск:
+    python bench_seeding.py [повторов]
+
+Сравнивает построение рассадки без кэша (seating.__wrapped__) и с кэшем
+для n = 2..100 игроков.
+"""
+import sys
+import timeit
+
+from seeding import seating
+
+SIZES = range(2, 101)
+
+
+def build(fn):
+    for n in SIZES:
+        fn(n)
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    build(seating)  # прогрев кэша
+    for name, fn in [
+        ("seating, no cache", lambda: build(seating.__wrapped__)),
+        ("seating, lru cache", lambda: build(seating)),
+    ]:
+        best = min(timeit.repeat(fn, number=number, repeat=5))
+        print(f"{name:20} {best / (number * len(SIZES)) * 1e6:8.2f} µs/call")
+    print(seating.cache_info())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Итоговый раунд – сетка на места для двух сторон, ранжированных по
+результатам простого раунда. Для 2×4 игроков это ровно 14 игр из task.md,
+остальные размеры строятся так же: стороны дополняются пустыми местами
+(BYE) до степени двойки, игры с пустым местом решаются заранее (проход
+без игры), оставшиеся игры и места перенумеровываются подряд.
+
+Слот – откуда берётся участник игры или обладатель места:
+  ("seed", side, rank) – игрок стороны side с местом rank (с нуля);
+  ("win", n) / ("lose", n) – победитель / проигравший игры n.
+"""
+import functools
+from dataclasses import dataclass
+
+BYE = ("bye",)
+
+
+@dataclass(frozen=True)
+class BracketGame:
+    number: int
+    slots: tuple[tuple, tuple]
+
+
+@dataclass(frozen=True)
+class Bracket:
+    games: tuple[BracketGame, ...]  # games[i].number == i + 1
+    places: tuple[tuple, ...]  # places[k] – слот, занимающий место k + 1
+    dependents: dict[int, tuple[int, ...]]  # игра -> игры, ждущие её исхода
+
+    def game(self, number) -> BracketGame:
+        return self.games[number - 1]
+
+    def opening(self) -> list[BracketGame]:
+        """Игры, которые можно назначить сразу: оба участника – игроки сторон."""
+        return [g for g in self.games if all(sl[0] == "seed" for sl in g.slots)]
+
+
+@functools.lru_cache(maxsize=None)
+def compile_bracket(n1: int, n2: int) -> Bracket:
+    """
+    Сетка на места для сторон из n1 и n2 игроков. Строится рекурсивно:
+    первый круг; победители и проигравшие играют между собой; победители
+    победителей разыгрывают верхние места, проигравшие проигравших –
+    нижние, а остальные перекрёстно – средние. Четыре игрока – финал и
+    игра за третье место. Номера игр идут по кругам, как в task.md.
+    """
+    half = 2
+    while half < max(n1, n2):
+        half *= 2
+    a, b = ([("seed", side, r) if r < n else BYE for r in range(half)]
+            for side, n in enumerate((n1, n2)))
+
+    games: list[tuple[int, tuple, tuple]] = []  # (круг, слот, слот) в порядке создания
+
+    def play(depth, x, y):
+        games.append((depth, x, y))
+        return ("win", len(games) - 1), ("lose", len(games) - 1)
+
+    def place(pairs, depth) -> list[tuple]:
+        """Разыгрывает места между участниками пар; слоты мест по порядку."""
+        first = [play(depth, x, y) for x, y in pairs]
+        if len(first) == 1:
+            return list(first[0])
+        if len(first) == 2:
+            (w1, l1), (w2, l2) = first
+            return [*play(depth + 1, w1, w2), *play(depth + 1, l1, l2)]
+        k = len(first) // 2
+        wins = [play(depth + 1, first[i][0], first[i + k][0]) for i in range(k)]
+        losses = [play(depth + 1, first[k - 1 - i][1], first[2 * k - 1 - i][1]) for i in range(k)]
+        middle = place([(losses[i][0], wins[k - 1 - i][1]) for i in range(k)], depth + 2)
+        bottom = place([(losses[i][1], losses[i + k // 2][1]) for i in range(k // 2)], depth + 2)
+        top = place([(wins[i][0], wins[i + k // 2][0]) for i in range(k // 2)], depth + 2)
+        return top + middle + bottom
+
+    k = half // 2
+    out = place([(a[i], b[half - 1 - i]) for i in range(k)]
+                + [(b[i], a[half - 1 - i]) for i in range(k)], 0)
+
+    # Игры с пустым местом не играются: второй участник проходит дальше
+    alias: dict[tuple, tuple] = {}
+    played = []
+    for gid, (depth, x, y) in enumerate(games):
+        x, y = alias.get(x, x), alias.get(y, y)
+        if x == BYE or y == BYE:
+            alias[("win", gid)] = y if x == BYE else x
+            alias[("lose", gid)] = BYE
+        else:
+            played.append((depth, gid, x, y))
+    played.sort()
+    number = {gid: n for n, (_, gid, _, _) in enumerate(played, start=1)}
+
+    def slot(sl):
+        sl = alias.get(sl, sl)
+        return (sl[0], number[sl[1]]) if sl[0] in ("win", "lose") else sl
+
+    result = tuple(BracketGame(number[gid], (slot(x), slot(y))) for _, gid, x, y in played)
+    dependents: dict[int, list[int]] = {}
+    for g in result:
+        for sl in g.slots:
+            if sl[0] != "seed":
+                dependents.setdefault(sl[1], []).append(g.number)
+    return Bracket(
+        games=result,
+        places=tuple(slot(sl) for sl in out if alias.get(sl, sl) != BYE),
+        dependents={n: tuple(deps) for n, deps in dependents.items()},
+    )
+
+
+def slot_player(sl, sides, result) -> int | None:
+    """
+    Игрок в слоте: sides – id игроков сторон по местам, result(n) –
+    (победитель, проигравший) завершённой игры n или None.
+    """
+    if sl[0] == "seed":
+        return sides[sl[1]][sl[2]]
+    res = result(sl[1])
+    return res and res[0 if sl[0] == "win" else 1]
+
+
+def bracket_ready(bracket, sides, result, number) -> list[tuple[int, int, int]]:
+    """
+    Игры, которые стали определены после завершения игры number:
+    [(номер игры, игрок 1, игрок 2)].
+    """
+    ready = []
+    for dep in bracket.dependents.get(number, ()):
+        p1, p2 = (slot_player(sl, sides, result) for sl in bracket.game(dep).slots)
+        if p1 is not None and p2 is not None:
+            ready.append((dep, p1, p2))
+    return ready
+
+
+def bracket_places(bracket, sides, result) -> list[int | None]:
+    """Id игроков по занятым местам (None – место ещё не разыграно)."""
+    return [slot_player(sl, sides, result) for sl in bracket.places]
+
+
+def bracket_sides(tables, players) -> list[list[int]]:
+    """
+    Две стороны сетки из таблиц простого раунда (нечётные таблицы – первая
+    сторона, чётные – вторая), каждая по убыванию очков.
+    players – игроки в порядке рейтинга (очки по убыванию).
+    """
+    side_of = {pid: idx % 2 for idx, tbl in enumerate(tables) for pid in tbl}
+    sides: list[list[int]] = [[], []]
+    for p in players:
+        if p.id in side_of:
+            sides[side_of[p.id]].append(p.id)
+    return sides
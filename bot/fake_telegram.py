@@ -0,0 +1,237 @@
+"""
+Локальный «Telegram» для замера задержки нажатия: webhook против polling.
+
+Скрипт поднимает поддельный Bot API (getMe, setWebhook, getUpdates,
+sendMessage, ...) и подаёт боту апдейты /start, засекая время от отправки
+апдейта до первого ответного вызова Bot API в тот же чат.
+
+Бот запускается отдельно (до или после скрипта) и смотрит на поддельный API:
+    TELEGRAM_API_URL=http://127.0.0.1:8081/bot TELEGRAM_BOT_TOKEN=1:fake \\
+    BOT_MODE=webhook WEBHOOK_URL=http://127.0.0.1:8443 WEBHOOK_LISTEN=127.0.0.1 \\
+    WEBHOOK_SECRET=s3cret python app.py
+
+Запуск:
+    python fake_telegram.py webhook [апдейтов]   # POST на WEBHOOK_PATH с секретом
+    python fake_telegram.py polling [апдейтов]   # отдаёт апдейты через getUpdates
+
+Скрипт ждёт, пока бот поднимется (setWebhook и открытый порт webhook'а
+или первый getUpdates), до STARTUP_TIMEOUT секунд. В режиме webhook
+дополнительно проверяется, что запрос с неверным
+X-Telegram-Bot-Api-Secret-Token отклоняется встроенным сервером (403).
+При любой ошибке скрипт завершается с ненулевым кодом – его можно
+запускать без участия человека. Порты и секрет берутся из тех же WEBHOOK_*
+переменных, порт API – FAKE_API_PORT.
+"""
+import json
+import os
+import queue
+import socket
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+API_PORT = int(os.getenv("FAKE_API_PORT", "8081"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "s3cret")
+STARTUP_TIMEOUT = float(os.getenv("STARTUP_TIMEOUT", "60"))
+CHAT_ID = 777000001
+REPLY_TIMEOUT = 10.0
+
+
+class FakeApi:
+    """Состояние поддельного Bot API: очередь getUpdates и ответные вызовы бота."""
+
+    def __init__(self):
+        self.updates = queue.Queue()
+        self.replies = queue.Queue()
+        self.message_id = 0
+        self.lock = threading.Lock()
+        self.webhook_set = threading.Event()
+        self.polling = threading.Event()
+
+    def call(self, method, params):
+        if method == "setwebhook":
+            self.webhook_set.set()
+        if method == "getme":
+            return {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        if method == "getupdates":
+            self.polling.set()
+            return self.get_updates(float(params.get("timeout") or 0))
+        chat_id = params.get("chat_id")
+        if chat_id is not None:
+            self.replies.put((time.perf_counter(), method, int(chat_id)))
+        if method in ("sendmessage", "editmessagetext", "editmessagereplymarkup"):
+            with self.lock:
+                self.message_id += 1
+                mid = self.message_id
+            return {
+                "message_id": int(params.get("message_id") or mid),
+                "date": int(time.time()),
+                "chat": {"id": int(chat_id or CHAT_ID), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        return True
+
+    def get_updates(self, timeout):
+        try:
+            batch = [self.updates.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while not self.updates.empty():
+            batch.append(self.updates.get_nowait())
+        return batch
+
+    def wait_reply(self, chat_id):
+        deadline = time.perf_counter() + REPLY_TIMEOUT
+        while True:
+            at, method, cid = self.replies.get(timeout=max(0.0, deadline - time.perf_counter()))
+            if cid == chat_id:
+                return at, method
+
+    def drain(self):
+        while not self.replies.empty():
+            self.replies.get_nowait()
+
+
+def parse_params(handler):
+    body = handler.rfile.read(int(handler.headers.get("Content-Length") or 0))
+    ctype = handler.headers.get("Content-Type", "")
+    if ctype.startswith("application/json"):
+        return json.loads(body or b"{}")
+    params = {}
+    for key, values in urllib.parse.parse_qs(body.decode()).items():
+        value = values[-1]
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    return params
+
+
+def make_handler(api):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            method = self.path.rsplit("/", 1)[-1].lower()
+            result = api.call(method, parse_params(self))
+            body = json.dumps({"ok": True, "result": result}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_update(update_id):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": CHAT_ID, "type": "private"},
+            "from": {"id": CHAT_ID, "is_bot": False, "first_name": "Tester"},
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }
+
+
+def post_update(update, secret):
+    req = urllib.request.Request(
+        f"http://127.0.0.1:{WEBHOOK_PORT}/{WEBHOOK_PATH}",
+        data=json.dumps(update).encode(),
+        headers={"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": secret},
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=REPLY_TIMEOUT) as resp:
+            return resp.status
+    except urllib.error.HTTPError as exc:
+        return exc.code
+
+
+def check_wrong_secret(update_id):
+    status = post_update(start_update(update_id), WEBHOOK_SECRET + "-wrong")
+    print(f"неверный секрет: HTTP {status} – {'отклонён' if status == 403 else 'НЕ ОТКЛОНЁН'}")
+    return status == 403
+
+
+def wait_port(port, deadline):
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return True
+        except OSError:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.1)
+
+
+def wait_bot(api, mode):
+    """Ждёт, пока бот начнёт принимать апдейты в нужном режиме."""
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    if mode == "polling":
+        return api.polling.wait(STARTUP_TIMEOUT)
+    # сервер webhook'а может открыться чуть позже вызова setWebhook
+    return api.webhook_set.wait(STARTUP_TIMEOUT) and wait_port(WEBHOOK_PORT, deadline)
+
+
+def measure(api, mode, count):
+    acks, replies = [], []
+    for update_id in range(1, count + 1):
+        api.drain()
+        update = start_update(update_id)
+        t0 = time.perf_counter()
+        if mode == "webhook":
+            status = post_update(update, WEBHOOK_SECRET)
+            if status != 200:
+                raise SystemExit(f"❌ webhook ответил HTTP {status}")
+            acks.append(time.perf_counter() - t0)
+        else:
+            api.updates.put(update)
+        try:
+            at, _ = api.wait_reply(CHAT_ID)
+        except queue.Empty:
+            raise SystemExit(f"❌ нет ответа бота за {REPLY_TIMEOUT:.0f} с")
+        replies.append(at - t0)
+    if acks:
+        print(f"HTTP 200 от webhook: медиана {statistics.median(acks) * 1e3:6.1f} ms")
+    replies.sort()
+    print(
+        f"{mode}: {count} апдейтов, до ответа бота медиана "
+        f"{statistics.median(replies) * 1e3:6.1f} ms, max {replies[-1] * 1e3:6.1f} ms"
+    )
+
+
+def main():
+    mode = sys.argv[1] if len(sys.argv) > 1 else "webhook"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    if mode not in ("webhook", "polling"):
+        raise SystemExit("usage: fake_telegram.py webhook|polling [апдейтов]")
+    api = FakeApi()
+    server = ThreadingHTTPServer(("127.0.0.1", API_PORT), make_handler(api))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"поддельный Bot API: http://127.0.0.1:{API_PORT}/bot, ждём бота ({mode})")
+    try:
+        if not wait_bot(api, mode):
+            raise SystemExit(f"❌ бот не запустился за {STARTUP_TIMEOUT:.0f} с")
+        measure(api, mode, count)
+        if mode == "webhook" and not check_wrong_secret(count + 1):
+            sys.exit(1)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+-- 0001: базовая схема
+
 -- 1. Administrators
 CREATE TABLE IF NOT EXISTS administrators (
     id           SERIAL PRIMARY KEY,
@@ -56,4 +58,9 @@ CREATE TABLE IF NOT EXISTS matches (
     result        JSONB,
     status        VARCHAR(16) DEFAULT 'scheduled',
     created_at    TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-);
\ No newline at end of file
+);
+
+-- Базы, созданные раньше через Base.metadata.create_all, хранили JSON вместо JSONB
+ALTER TABLE tournaments ALTER COLUMN data   TYPE JSONB USING data::jsonb;
+ALTER TABLE rounds      ALTER COLUMN data   TYPE JSONB USING data::jsonb;
+ALTER TABLE matches     ALTER COLUMN result TYPE JSONB USING result::jsonb;
@@ -0,0 +1,36 @@
+-- 0002: индексы под горячие запросы бота
+
+-- Игроки турнира: загрузка состояния турнира, экспорт, раунды
+CREATE INDEX IF NOT EXISTS players_tournament_idx
+    ON players (tournament_id, id);
+
+-- Все раунды турнира по порядку: состояние турнира и история игр
+CREATE INDEX IF NOT EXISTS rounds_tournament_created_idx
+    ON rounds (tournament_id, created_at, id);
+
+-- Текущий (незавершённый) раунд турнира
+CREATE INDEX IF NOT EXISTS rounds_pending_idx
+    ON rounds (tournament_id)
+    WHERE status = 'pending';
+
+-- Последний завершённый простой раунд (round_final)
+CREATE INDEX IF NOT EXISTS rounds_type_status_created_idx
+    ON rounds (tournament_id, round_type, status, created_at DESC);
+
+-- Матчи раунда по статусу: меню, старт игры, проверка завершения раунда
+CREATE INDEX IF NOT EXISTS matches_round_status_idx
+    ON matches (round_id, status);
+
+-- ON DELETE SET NULL по игрокам без полного скана matches
+CREATE INDEX IF NOT EXISTS matches_player1_idx ON matches (player1_id);
+CREATE INDEX IF NOT EXISTS matches_player2_idx ON matches (player2_id);
+
+-- История: последние завершённые турниры (history_cb)
+CREATE INDEX IF NOT EXISTS tournaments_ended_created_idx
+    ON tournaments (created_at DESC)
+    WHERE status = 'ended';
+
+-- Активные турниры (active_cb)
+CREATE INDEX IF NOT EXISTS tournaments_not_ended_idx
+    ON tournaments (created_at)
+    WHERE status <> 'ended';
@@ -0,0 +1,9 @@
+-- 0003: user_data и состояния диалогов бота (PostgresPersistence)
+
+CREATE TABLE IF NOT EXISTS bot_state (
+    kind        VARCHAR(64)  NOT NULL,  -- 'user' или 'conv:<имя диалога>'
+    key         VARCHAR(128) NOT NULL,  -- user_id или JSON-ключ диалога
+    data        JSONB        NOT NULL,
+    updated_at  TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (kind, key)
+);
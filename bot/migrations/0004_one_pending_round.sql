@@ -0,0 +1,40 @@
+-- 0004: не больше одного незавершённого раунда на турнир
+
+-- Двойное нажатие «Простой раунд» могло создать второй pending-раунд,
+-- после чего выборка текущего раунда (scalar_one_or_none) падала.
+-- Оставляем самый ранний pending-раунд. Более поздние дубликаты без
+-- сыгранных матчей удаляем вместе с их матчами; матчи удаляются явно,
+-- потому что у баз из create_all внешний ключ без ON DELETE CASCADE
+-- (его чинит 0006).
+DELETE FROM matches m
+ USING rounds r, rounds older
+ WHERE m.round_id = r.id
+   AND older.tournament_id = r.tournament_id
+   AND older.status = 'pending'
+   AND r.status = 'pending'
+   AND (older.created_at, older.id) < (r.created_at, r.id)
+   AND NOT EXISTS (SELECT 1 FROM matches d WHERE d.round_id = r.id AND d.status = 'done');
+
+DELETE FROM rounds r
+ USING rounds older
+ WHERE older.tournament_id = r.tournament_id
+   AND older.status = 'pending'
+   AND r.status = 'pending'
+   AND (older.created_at, older.id) < (r.created_at, r.id)
+   AND NOT EXISTS (SELECT 1 FROM matches d WHERE d.round_id = r.id AND d.status = 'done');
+
+-- Дубликаты, в которых уже есть результаты, не удаляем, а закрываем
+UPDATE rounds r
+   SET status = 'done'
+  FROM rounds older
+ WHERE older.tournament_id = r.tournament_id
+   AND older.status = 'pending'
+   AND r.status = 'pending'
+   AND (older.created_at, older.id) < (r.created_at, r.id);
+
+DROP INDEX IF EXISTS rounds_pending_idx;
+
+-- Текущий (незавершённый) раунд турнира, теперь уникальный
+CREATE UNIQUE INDEX IF NOT EXISTS rounds_one_pending_idx
+    ON rounds (tournament_id)
+    WHERE status = 'pending';
@@ -0,0 +1,9 @@
+-- 0005: физический стол, за которым идёт игра
+
+-- table_number – номер таблицы (или игры сетки), court – стол в зале
+ALTER TABLE matches ADD COLUMN IF NOT EXISTS court INTEGER;
+
+-- За одним столом раунда одновременно идёт не больше одной игры
+CREATE UNIQUE INDEX IF NOT EXISTS matches_round_court_playing_idx
+    ON matches (round_id, court)
+    WHERE status = 'playing';
@@ -0,0 +1,48 @@
+-- 0006: CHECK-ограничения и ON DELETE для баз из create_all
+
+-- Base.metadata.create_all создавал таблицы без CHECK и с внешними ключами
+-- без ON DELETE, а CREATE TABLE IF NOT EXISTS из 0001 такие таблицы не
+-- трогает. Ограничения пересоздаются под стандартными именами Postgres
+-- (<таблица>_<колонка>_check / _fkey), поэтому на базах, созданных
+-- миграциями, это та же схема, что и была.
+ALTER TABLE administrators
+    DROP CONSTRAINT IF EXISTS administrators_role_check,
+    ADD CONSTRAINT administrators_role_check CHECK (role IN ('main','senior','admin'));
+
+ALTER TABLE reg_codes
+    DROP CONSTRAINT IF EXISTS reg_codes_role_check,
+    ADD CONSTRAINT reg_codes_role_check CHECK (role IN ('senior','admin'));
+
+ALTER TABLE tournaments
+    DROP CONSTRAINT IF EXISTS tournaments_tournament_type_check,
+    DROP CONSTRAINT IF EXISTS tournaments_status_check,
+    DROP CONSTRAINT IF EXISTS tournaments_admin_id_fkey,
+    ADD CONSTRAINT tournaments_tournament_type_check CHECK (tournament_type IN ('Beginner','Advanced')),
+    ADD CONSTRAINT tournaments_status_check CHECK (status IN ('registration','active','ended')),
+    ADD CONSTRAINT tournaments_admin_id_fkey FOREIGN KEY (admin_id)
+        REFERENCES administrators(id) ON DELETE CASCADE;
+
+ALTER TABLE players
+    DROP CONSTRAINT IF EXISTS players_tournament_id_fkey,
+    ADD CONSTRAINT players_tournament_id_fkey FOREIGN KEY (tournament_id)
+        REFERENCES tournaments(id) ON DELETE CASCADE;
+
+ALTER TABLE rounds
+    DROP CONSTRAINT IF EXISTS rounds_round_type_check,
+    DROP CONSTRAINT IF EXISTS rounds_status_check,
+    DROP CONSTRAINT IF EXISTS rounds_tournament_id_fkey,
+    ADD CONSTRAINT rounds_round_type_check CHECK (round_type IN ('simple','final')),
+    ADD CONSTRAINT rounds_status_check CHECK (status IN ('pending','done')),
+    ADD CONSTRAINT rounds_tournament_id_fkey FOREIGN KEY (tournament_id)
+        REFERENCES tournaments(id) ON DELETE CASCADE;
+
+ALTER TABLE matches
+    DROP CONSTRAINT IF EXISTS matches_round_id_fkey,
+    DROP CONSTRAINT IF EXISTS matches_player1_id_fkey,
+    DROP CONSTRAINT IF EXISTS matches_player2_id_fkey,
+    ADD CONSTRAINT matches_round_id_fkey FOREIGN KEY (round_id)
+        REFERENCES rounds(id) ON DELETE CASCADE,
+    ADD CONSTRAINT matches_player1_id_fkey FOREIGN KEY (player1_id)
+        REFERENCES players(id) ON DELETE SET NULL,
+    ADD CONSTRAINT matches_player2_id_fkey FOREIGN KEY (player2_id)
+        REFERENCES players(id) ON DELETE SET NULL;
@@ -0,0 +1,93 @@
+"""
+ORM-модели бота. Схему задают только migrations/*.sql, модели её повторяют.
+"""
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, TIMESTAMP, ForeignKey, CheckConstraint, func
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import declarative_base, relationship
+
+Base = declarative_base()
+
+
+class Administrator(Base):
+    __tablename__ = "administrators"
+    __table_args__ = (CheckConstraint("role IN ('main','senior','admin')"),)
+    id = Column(Integer, primary_key=True)
+    telegram_id = Column(BigInteger, unique=True)
+    username = Column(String(64), nullable=False, unique=True)
+    password = Column(String(128), nullable=False)
+    role = Column(String(16), nullable=False, default="admin", server_default="admin")
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+
+class RegCode(Base):
+    __tablename__ = "reg_codes"
+    __table_args__ = (CheckConstraint("role IN ('senior','admin')"),)
+    code = Column(String(64), primary_key=True)
+    role = Column(String(16), nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+
+class Tournament(Base):
+    __tablename__ = "tournaments"
+    __table_args__ = (
+        CheckConstraint("tournament_type IN ('Beginner','Advanced')"),
+        CheckConstraint("status IN ('registration','active','ended')"),
+    )
+    id = Column(Integer, primary_key=True)
+    admin_id = Column(Integer, ForeignKey("administrators.id", ondelete="CASCADE"))
+    name = Column(String(255), nullable=False)
+    tournament_type = Column(String(32), nullable=False)
+    status = Column(String(32), nullable=False, default="registration", server_default="registration")
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    finished_at = Column(TIMESTAMP(timezone=True))
+    data = Column(JSONB, default=dict)
+    players = relationship("Player", back_populates="tournament")
+    rounds = relationship("Round", back_populates="tournament")
+
+
+class Player(Base):
+    __tablename__ = "players"
+    id = Column(Integer, primary_key=True)
+    tournament_id = Column(Integer, ForeignKey("tournaments.id", ondelete="CASCADE"))
+    name = Column(String(128), nullable=False)
+    score = Column(Integer, default=0, server_default="0")
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    tournament = relationship("Tournament", back_populates="players")
+
+
+class Round(Base):
+    __tablename__ = "rounds"
+    __table_args__ = (
+        CheckConstraint("round_type IN ('simple','final')"),
+        CheckConstraint("status IN ('pending','done')"),
+    )
+    id = Column(Integer, primary_key=True)
+    tournament_id = Column(Integer, ForeignKey("tournaments.id", ondelete="CASCADE"))
+    round_type = Column(String(16), nullable=False)
+    data = Column(JSONB, nullable=False)
+    status = Column(String(16), nullable=False, default="pending", server_default="pending")
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    tournament = relationship("Tournament", back_populates="rounds")
+
+
+class Match(Base):
+    __tablename__ = "matches"
+    id = Column(Integer, primary_key=True)
+    round_id = Column(Integer, ForeignKey("rounds.id", ondelete="CASCADE"))
+    table_number = Column(Integer)
+    court = Column(Integer)
+    player1_id = Column(Integer, ForeignKey("players.id", ondelete="SET NULL"))
+    player2_id = Column(Integer, ForeignKey("players.id", ondelete="SET NULL"))
+    result = Column(JSONB, default=dict)
+    status = Column(String(16), default="scheduled", server_default="scheduled")
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+
+class BotState(Base):
+    __tablename__ = "bot_state"
+    kind = Column(String(64), primary_key=True)
+    key = Column(String(128), primary_key=True)
+    data = Column(JSONB, nullable=False)
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
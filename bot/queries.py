@@ -0,0 +1,71 @@
+"""
+Фиксированный набор запросов бота: собран один раз при импорте и
+параметризован через bindparam. SQLAlchemy берёт скомпилированный SQL из
+кэша (query_cache_size), asyncpg – готовый prepared statement
+(prepared_statement_cache_size). В горячем пути не строятся новые select().
+"""
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import aliased
+
+from models import Administrator, Match, Player, Round, Tournament
+
+Q_ADMIN_BY_TG = select(Administrator).where(Administrator.telegram_id == bindparam("uid"))
+Q_ADMIN_BY_LOGIN = select(Administrator).where(Administrator.username == bindparam("login"))
+Q_LOGGED_IN_ADMINS = (
+    select(Administrator.telegram_id, Administrator.id, Administrator.role)
+    .where(Administrator.telegram_id.isnot(None))
+)
+
+Q_ENDED_TOURNAMENTS = (
+    select(Tournament)
+    .where(Tournament.status == "ended")
+    .order_by(Tournament.created_at.desc())
+    .limit(4)
+)
+Q_ACTIVE_TOURNAMENTS = select(Tournament).where(Tournament.status != "ended")
+
+Q_TOURNAMENT_WITH_PLAYERS = (
+    select(Tournament, Player)
+    .outerjoin(Player, Player.tournament_id == Tournament.id)
+    .where(Tournament.id == bindparam("tid"))
+    .order_by(Player.id)
+)
+Q_ROUNDS_WITH_MATCHES = (
+    select(Round, Match)
+    .outerjoin(Match, Match.round_id == Round.id)
+    .where(Round.tournament_id == bindparam("tid"))
+    .order_by(Round.created_at, Round.id, Match.id)
+)
+
+_HistP1, _HistP2 = aliased(Player), aliased(Player)
+Q_HISTORY = (
+    select(Round, Match, _HistP1.name, _HistP2.name)
+    .join(Match, Match.round_id == Round.id)
+    .outerjoin(_HistP1, _HistP1.id == Match.player1_id)
+    .outerjoin(_HistP2, _HistP2.id == Match.player2_id)
+    .where(Round.tournament_id == bindparam("tid"))
+    .order_by(Round.created_at, Round.id, Match.table_number, Match.id)
+)
+
+Q_PLAYERS = select(Player).where(Player.tournament_id == bindparam("tid"))
+Q_PLAYERS_BY_SCORE = Q_PLAYERS.order_by(Player.score.desc(), Player.id)
+Q_LAST_SIMPLE_DONE = (
+    select(Round)
+    .where(
+        Round.tournament_id == bindparam("tid"),
+        Round.round_type == "simple",
+        Round.status == "done"
+    )
+    .order_by(Round.created_at.desc())
+    .limit(1)
+)
+Q_MATCH_TOURNAMENT = (
+    select(Round.tournament_id)
+    .join(Match, Match.round_id == Round.id)
+    .where(Match.id == bindparam("mid"))
+)
+Q_LOCK_MATCH_ROUND = (
+    select(Round.id)
+    .where(Round.id == select(Match.round_id).where(Match.id == bindparam("mid")).scalar_subquery())
+    .with_for_update()
+)
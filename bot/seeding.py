@@ -0,0 +1,49 @@
+"""
+Рассадка игроков простого раунда по таблицам (task.md): чётное число
+таблиц по 2–7 игроков, приоритетно две, размеры как можно ровнее, места
+заполняются змейкой по рейтингу.
+"""
+import functools
+
+
+def table_count(n) -> int:
+    """
+    Число таблиц простого раунда: чётное, по 2–7 игроков, как можно меньше
+    (приоритетно две). Меньше четырёх игроков – одна таблица.
+    """
+    if n < 4:
+        return 1 if n else 0
+    return 2 * -(-n // 14)
+
+
+def seat_order(size) -> list[int]:
+    """Порядок заполнения мест таблицы: P1, Ps, P2, Ps-1, … (с нуля)."""
+    order = []
+    lo, hi = 0, size - 1
+    while lo <= hi:
+        order.append(lo)
+        if lo != hi:
+            order.append(hi)
+        lo, hi = lo + 1, hi - 1
+    return order
+
+
+@functools.lru_cache(maxsize=None)
+def seating(n: int) -> tuple[tuple[int, ...], ...]:
+    """
+    Рассадка n игроков по рейтингу (0 – лучший): для каждой таблицы –
+    номера игроков на местах P1..Ps. Размеры таблиц отличаются не больше
+    чем на один. Места заполняются уровнями по всем таблицам сразу:
+    T1P1 – 1-й, T2P1 – 2-й, T1P4 – 3-й, T2P4 – 4-й, T1P2 – 5-й и т.д.
+    """
+    t = table_count(n)
+    sizes = [n // t + (i < n % t) for i in range(t)]
+    tables: list[list[int]] = [[0] * size for size in sizes]
+    orders = [seat_order(size) for size in sizes]
+    rank = 0
+    for level in range(max(sizes, default=0)):
+        for tbl, order in zip(tables, orders):
+            if level < len(order):
+                tbl[order[level]] = rank
+                rank += 1
+    return tuple(tuple(tbl) for tbl in tables)
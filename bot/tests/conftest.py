@@ -0,0 +1,7 @@
+import os
+import sys
+
+# модули бота (bracket, seeding, app) импортируются как в контейнере: из bot/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app собирает DB_URL при импорте; к базе тесты не подключаются
+os.environ.setdefault("DB_PORT", "5432")
@@ -0,0 +1,110 @@
+import random
+from collections import Counter
+
+import pytest
+
+from bracket import compile_bracket, bracket_ready, bracket_places
+
+SIZES = [(n1, n2) for n1 in range(8) for n2 in range(8) if 4 <= n1 + n2 <= 14]
+
+# task.md, таблица на 8 игроков: (номер игры, участник 1, участник 2)
+TASK_MD_2x4 = [
+    (1, ("seed", 0, 0), ("seed", 1, 3)),
+    (2, ("seed", 0, 1), ("seed", 1, 2)),
+    (3, ("seed", 1, 0), ("seed", 0, 3)),
+    (4, ("seed", 1, 1), ("seed", 0, 2)),
+    (5, ("win", 1), ("win", 3)),
+    (6, ("win", 2), ("win", 4)),
+    (7, ("lose", 2), ("lose", 4)),
+    (8, ("lose", 1), ("lose", 3)),
+    (9, ("win", 7), ("lose", 6)),
+    (10, ("win", 8), ("lose", 5)),
+    (11, ("lose", 7), ("lose", 8)),
+    (12, ("win", 5), ("win", 6)),
+    (13, ("win", 9), ("win", 10)),
+    (14, ("lose", 9), ("lose", 10)),
+]
+
+
+def seeds(n1, n2):
+    return [("seed", 0, r) for r in range(n1)] + [("seed", 1, r) for r in range(n2)]
+
+
+def play_out(bracket, rng):
+    """Случайные исходы всех игр по порядку номеров: номер -> (победитель, проигравший)."""
+    results = {}
+
+    def value(sl):
+        if sl[0] == "seed":
+            return sl
+        return results[sl[1]][0 if sl[0] == "win" else 1]
+
+    for g in bracket.games:
+        x, y = (value(sl) for sl in g.slots)
+        assert x != y
+        results[g.number] = (x, y) if rng.random() < 0.5 else (y, x)
+    return results
+
+
+def test_two_tables_of_four_match_task_md():
+    bracket = compile_bracket(4, 4)
+    assert [(g.number, *g.slots) for g in bracket.games] == TASK_MD_2x4
+    assert bracket.places == (
+        ("win", 12), ("lose", 12), ("win", 13), ("lose", 13),
+        ("win", 14), ("lose", 14), ("win", 11), ("lose", 11),
+    )
+
+
+@pytest.mark.parametrize("n1,n2", SIZES)
+def test_games_only_depend_on_earlier_games(n1, n2):
+    bracket = compile_bracket(n1, n2)
+    for i, g in enumerate(bracket.games, start=1):
+        assert g.number == i
+        for sl in g.slots:
+            assert sl[0] == "seed" or sl[1] < g.number
+
+
+@pytest.mark.parametrize("n1,n2", SIZES)
+def test_every_game_output_is_used_exactly_once(n1, n2):
+    bracket = compile_bracket(n1, n2)
+    uses = Counter(sl for g in bracket.games for sl in g.slots)
+    uses.update(bracket.places)
+    for g in bracket.games:
+        assert uses[("win", g.number)] == 1
+        assert uses[("lose", g.number)] == 1
+    for sl in seeds(n1, n2):
+        assert uses[sl] == 1
+
+
+@pytest.mark.parametrize("n1,n2", SIZES)
+def test_random_results_give_a_complete_set_of_places(n1, n2):
+    bracket = compile_bracket(n1, n2)
+    sides = [[f"a{r}" for r in range(n1)], [f"b{r}" for r in range(n2)]]
+    rng = random.Random(n1 * 100 + n2)
+    for _ in range(50):
+        results = play_out(bracket, rng)
+        ids = {("seed", 0, r): f"a{r}" for r in range(n1)} | {("seed", 1, r): f"b{r}" for r in range(n2)}
+        named = {n: (ids[w], ids[l]) for n, (w, l) in results.items()}
+        places = bracket_places(bracket, sides, named.get)
+        assert sorted(places) == sorted(sides[0] + sides[1])
+
+
+@pytest.mark.parametrize("n1,n2", SIZES)
+def test_progression_schedules_each_game_once(n1, n2):
+    bracket = compile_bracket(n1, n2)
+    sides = [[f"a{r}" for r in range(n1)], [f"b{r}" for r in range(n2)]]
+    scheduled = {g.number for g in bracket.opening()}
+    results = {}
+    rng = random.Random(n1 * 100 + n2)
+    pending = sorted(scheduled)
+    while pending:
+        number = pending.pop(rng.randrange(len(pending)))
+        g = bracket.game(number)
+        p1, p2 = (sides[sl[1]][sl[2]] if sl[0] == "seed" else
+                  results[sl[1]][0 if sl[0] == "win" else 1] for sl in g.slots)
+        results[number] = (p1, p2) if rng.random() < 0.5 else (p2, p1)
+        for dep, *_ in bracket_ready(bracket, sides, results.get, number):
+            assert dep not in scheduled
+            scheduled.add(dep)
+            pending.append(dep)
+    assert scheduled == {g.number for g in bracket.games}
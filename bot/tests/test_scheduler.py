@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("telegram")
+from app import RestScheduler  # noqa: E402
+
+
+def match(mid, p1, p2, status="scheduled", court=None):
+    return SimpleNamespace(id=mid, player1_id=p1, player2_id=p2, status=status, court=court)
+
+
+def test_rebuild_withholds_courts_of_untracked_games():
+    sched = RestScheduler.from_matches([
+        match(1, 1, 2, "playing"),
+        match(2, 3, 4, "playing"),
+        match(3, 1, 3),
+    ], courts=2)
+    assert sched.free == []
+    assert sched.pick(len(sched.free)) == []
+
+
+def test_finishing_untracked_games_releases_their_courts():
+    sched = RestScheduler.from_matches([
+        match(1, 1, 2, "playing"),
+        match(2, 3, 4, "playing"),
+        match(3, 1, 3),
+    ], courts=2)
+    sched.finish(1)
+    sched.finish(2)
+    assert sorted(sched.free) == [1, 2]
+    assert sched.pick(len(sched.free)) == [3]
+
+
+def test_tracked_and_untracked_games_share_the_hall():
+    sched = RestScheduler.from_matches([
+        match(1, 1, 2, "playing", court=2),
+        match(2, 3, 4, "playing"),
+        match(3, 5, 6, "done"),
+    ], courts=3)
+    assert len(sched.free) == 1
+    sched.finish(2)
+    sched.finish(1)
+    assert sorted(sched.free) == [1, 2, 3]
+    # игра, начатая сверх столов, чужой придержанный стол не забирает
+    sched.add(4, 1, 3)
+    sched.start(4)
+    sched.finish(4)
+    assert sorted(sched.free) == [1, 2, 3]
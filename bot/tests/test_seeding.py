@@ -0,0 +1,56 @@
+import pytest
+
+from seeding import seat_order, seating, table_count
+
+N = range(2, 101)
+
+
+@pytest.mark.parametrize("n", N)
+def test_every_rank_is_seated_once(n):
+    assert sorted(r for tbl in seating(n) for r in tbl) == list(range(n))
+
+
+@pytest.mark.parametrize("n", N)
+def test_table_sizes(n):
+    sizes = [len(tbl) for tbl in seating(n)]
+    assert max(sizes) - min(sizes) <= 1
+    if n >= 4:
+        assert len(sizes) % 2 == 0
+        assert all(2 <= size <= 7 for size in sizes)
+    else:
+        assert len(sizes) == 1
+
+
+@pytest.mark.parametrize("n", N)
+def test_fewest_tables(n):
+    t = table_count(n)
+    if 4 <= n <= 14:
+        assert t == 2
+    if n >= 4 and t > 2:
+        # двумя таблицами меньше уже не уместить всех по 7
+        assert n > 7 * (t - 2)
+
+
+def test_snake_order_from_task_md():
+    t1, t2 = seating(8)
+    # T1P1 = 1, T2P1 = 2, T1P4 = 3, T2P4 = 4, T1P2 = 5, T2P2 = 6, T1P3 = 7, T2P3 = 8
+    assert (t1[0], t2[0], t1[3], t2[3], t1[1], t2[1], t1[2], t2[2]) == tuple(range(8))
+
+
+@pytest.mark.parametrize("n", N)
+def test_levels_go_across_tables(n):
+    tables = seating(n)
+    orders = [seat_order(len(tbl)) for tbl in tables]
+    expected = [
+        tbl[order[level]]
+        for level in range(max(map(len, tables)))
+        for tbl, order in zip(tables, orders)
+        if level < len(order)
+    ]
+    assert expected == list(range(n))
+
+
+def test_seat_order():
+    assert seat_order(4) == [0, 3, 1, 2]
+    assert seat_order(5) == [0, 4, 1, 3, 2]
+    assert seat_order(1) == [0]
@@ -0,0 +1,102 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("telegram")
+import app  # noqa: E402
+
+EDIT = {"chat_id": 5, "message_id": 9}
+
+
+def recorder(sent):
+    def make(label):
+        async def call():
+            sent.append(label)
+            return label
+        return call
+    return make
+
+
+async def drain_burst(queue):
+    # burst=1: первый запрос в чат уходит сразу, следующие ждут токена
+    await queue.process_request(recorder([])("msg"), (), {}, "sendMessage", {"chat_id": 5}, None)
+
+
+def test_queued_edits_are_coalesced():
+    async def run():
+        queue, sent = app.SendQueue(chat_rate=20, burst=1), []
+        call = recorder(sent)
+        await drain_burst(queue)
+        taps = [
+            asyncio.create_task(queue.process_request(call(n), (), {}, "editMessageReplyMarkup", EDIT, None))
+            for n in range(5)
+        ]
+        return await asyncio.gather(*taps), sent, queue.coalesced
+
+    results, sent, coalesced = asyncio.run(run())
+    assert sent == [4]
+    assert results == [4] * 5
+    assert coalesced == 4
+
+
+def test_cancelled_first_caller_does_not_drop_newer_edit():
+    async def run():
+        queue, sent = app.SendQueue(chat_rate=20, burst=1), []
+        call = recorder(sent)
+        await drain_burst(queue)
+        first = asyncio.create_task(queue.process_request(call("old"), (), {}, "editMessageText", EDIT, None))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(queue.process_request(call("new"), (), {}, "editMessageText", EDIT, None))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second, sent, first.cancelled()
+
+    result, sent, cancelled = asyncio.run(run())
+    assert (result, sent, cancelled) == ("new", ["new"], True)
+
+
+def test_lone_cancelled_edit_is_not_sent():
+    async def run():
+        queue, sent = app.SendQueue(chat_rate=20, burst=1), []
+        await drain_burst(queue)
+        tap = asyncio.create_task(
+            queue.process_request(recorder(sent)("edit"), (), {}, "editMessageText", EDIT, None)
+        )
+        await asyncio.sleep(0)
+        tap.cancel()
+        await asyncio.sleep(0.1)
+        return sent, queue._edits
+
+    assert asyncio.run(run()) == ([], {})
+
+
+def test_adjust_score_does_not_wait_for_its_edit():
+    async def run():
+        edits, pending = [], []
+        release = asyncio.Event()
+
+        async def edit(markup):
+            edits.append(markup)
+            await release.wait()
+
+        async def answer(*args, **kwargs):
+            pass
+
+        def create_task(coro, update=None):
+            pending.append(asyncio.create_task(coro))
+
+        ctx = SimpleNamespace(
+            user_data={"score_mid": 7, "score_names": ("A", "B")},
+            application=SimpleNamespace(create_task=create_task),
+        )
+        for _ in range(3):
+            query = SimpleNamespace(data="inc_7_1", answer=answer, edit_message_reply_markup=edit)
+            # обработчик возвращается, пока правка табло ещё не отправлена
+            await asyncio.wait_for(app.adjust_score(SimpleNamespace(callback_query=query), ctx), 1)
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*pending)
+        return ctx.user_data["score_1"], len(edits)
+
+    assert asyncio.run(run()) == (3, 3)
@@ -0,0 +1,83 @@
+-- Бенчмарк горячих запросов бота до и после bot/migrations/0002_hot_query_indexes.sql.
+--
+-- Запуск (в отдельной схеме bench, рабочие таблицы не трогаются):
+--   psql -d ttbot_db -f db/bench/hot_queries.sql
+--
+-- Засевает 10 000 турниров по 16 игроков, простой раунд (2 таблицы по 8)
+-- и итоговый раунд, затем печатает планы и время запросов без индексов
+-- и с индексами.
+
+\set ON_ERROR_STOP on
+\timing off
+
+DROP SCHEMA IF EXISTS bench CASCADE;
+CREATE SCHEMA bench;
+SET search_path = bench;
+
+\ir ../../bot/migrations/0001_init.sql
+
+\echo '== seeding =='
+INSERT INTO administrators (username, password, role)
+VALUES ('bench', 'x', 'main');
+
+INSERT INTO tournaments (admin_id, name, tournament_type, status, created_at, data)
+SELECT 1,
+       'Турнир ' || t,
+       CASE WHEN t % 2 = 0 THEN 'Beginner' ELSE 'Advanced' END,
+       CASE WHEN t % 50 = 0 THEN 'active' ELSE 'ended' END,
+       NOW() - t * INTERVAL '1 hour',
+       '{"tables": 4}'::jsonb
+FROM generate_series(1, 10000) AS t;
+
+INSERT INTO players (tournament_id, name, score)
+SELECT t, 'Игрок ' || p, (random() * 14)::int
+FROM generate_series(1, 10000) AS t, generate_series(1, 16) AS p;
+
+INSERT INTO rounds (tournament_id, round_type, data, status, created_at)
+SELECT t.id, r.round_type, '{}'::jsonb,
+       CASE WHEN t.status = 'active' AND r.round_type = 'final' THEN 'pending' ELSE 'done' END,
+       t.created_at + r.shift
+FROM tournaments t,
+     (VALUES ('simple', INTERVAL '1 minute'), ('final', INTERVAL '2 minutes')) AS r(round_type, shift);
+
+-- простой раунд: каждый с каждым внутри двух таблиц по 8 игроков
+INSERT INTO matches (round_id, table_number, player1_id, player2_id, status, result)
+SELECT r.id, (a.rn - 1) / 8 + 1, a.id, b.id, 'done', '{"score": "3:1"}'::jsonb
+FROM rounds r
+JOIN LATERAL (
+    SELECT id, row_number() OVER (ORDER BY id) AS rn FROM players WHERE tournament_id = r.tournament_id
+) a ON TRUE
+JOIN LATERAL (
+    SELECT id, row_number() OVER (ORDER BY id) AS rn FROM players WHERE tournament_id = r.tournament_id
+) b ON (b.rn - 1) / 8 = (a.rn - 1) / 8 AND b.rn > a.rn
+WHERE r.round_type = 'simple';
+
+-- итоговый раунд: 8 игр на 16 игроков
+INSERT INTO matches (round_id, table_number, player1_id, player2_id, status)
+SELECT r.id, g, p.id, p.id + 8,
+       CASE WHEN r.status = 'pending' AND g > 4 THEN 'scheduled' ELSE 'done' END
+FROM rounds r
+JOIN LATERAL (SELECT min(id) AS id FROM players WHERE tournament_id = r.tournament_id) first ON TRUE
+CROSS JOIN generate_series(1, 8) AS g
+JOIN LATERAL (SELECT first.id + g - 1 AS id) p ON TRUE
+WHERE r.round_type = 'final';
+
+ANALYZE;
+
+\set tid 5000
+
+\echo
+\echo '########## BEFORE (без индексов) ##########'
+\ir hot_queries_explain.sql
+
+\echo
+\echo '== applying 0002_hot_query_indexes.sql =='
+\ir ../../bot/migrations/0002_hot_query_indexes.sql
+ANALYZE;
+
+\echo
+\echo '########## AFTER (с индексами) ##########'
+\ir hot_queries_explain.sql
+
+RESET search_path;
+DROP SCHEMA bench CASCADE;
@@ -0,0 +1,34 @@
+-- Планы горячих запросов bot/app.py; подключается из hot_queries.sql.
+
+\echo '-- history_cb: последние завершённые турниры'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT * FROM tournaments WHERE status = 'ended' ORDER BY created_at DESC LIMIT 4;
+
+\echo '-- active_cb: активные турниры'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT * FROM tournaments WHERE status <> 'ended';
+
+\echo '-- load_tournament_state: турнир + игроки'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT * FROM tournaments t LEFT JOIN players p ON p.tournament_id = t.id
+WHERE t.id = :tid ORDER BY p.id;
+
+\echo '-- load_tournament_state / load_history: раунды + матчи'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT * FROM rounds r LEFT JOIN matches m ON m.round_id = r.id
+WHERE r.tournament_id = :tid ORDER BY r.created_at, r.id, m.id;
+
+\echo '-- round_simple / start_match: текущий раунд'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT * FROM rounds WHERE tournament_id = :tid AND status = 'pending';
+
+\echo '-- round_final: последний завершённый простой раунд'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT * FROM rounds
+WHERE tournament_id = :tid AND round_type = 'simple' AND status = 'done'
+ORDER BY created_at DESC LIMIT 1;
+
+\echo '-- confirm_score: незавершённые матчи раунда'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT 1 FROM matches m JOIN rounds r ON r.id = m.round_id
+WHERE r.tournament_id = :tid AND m.status <> 'done';